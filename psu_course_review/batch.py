@@ -0,0 +1,38 @@
+from fastapi import HTTPException, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+MAX_BATCH_SIZE = 100
+
+
+def parse_ids(ids: str) -> list[int]:
+    try:
+        parsed = [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must be a comma separated list of integers",
+        )
+
+    # repeated ids are answered once, in the position they were first asked for
+    parsed = list(dict.fromkeys(parsed))
+    if len(parsed) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BATCH_SIZE} ids per batch",
+        )
+
+    return parsed
+
+
+async def read_by_ids(session: AsyncSession, model, ids: str) -> list:
+    row_ids = parse_ids(ids)
+    if not row_ids:
+        return []
+
+    result = await session.exec(select(model).where(model.id.in_(row_ids)))
+    rows = {row.id: row for row in result.all()}
+
+    # missing ids are skipped, the rest keep the requested order
+    return [rows[row_id] for row_id in row_ids if row_id in rows]
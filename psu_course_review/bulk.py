@@ -0,0 +1,113 @@
+import json
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from fastapi import HTTPException, Request, status
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import config
+from . import models
+
+
+logger = logging.getLogger(__name__)
+
+settings = config.get_settings()
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson")
+
+
+async def read_items(request: Request) -> AsyncIterator[tuple[int, Any]]:
+    content_type = request.headers.get("content-type", "")
+
+    if not content_type.startswith(NDJSON_MEDIA_TYPES):
+        try:
+            items = await request.json()
+        except ValueError:
+            items = None
+
+        if not isinstance(items, list):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Expected a JSON array or an NDJSON stream",
+            )
+
+        for index, item in enumerate(items):
+            yield index, item
+        return
+
+    # NDJSON lines are yielded raw and parsed while validating, as they arrive
+    index = 0
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield index, line
+                index += 1
+
+    if buffer.strip():
+        yield index, buffer
+
+
+def validate(schema: type[BaseModel], item: Any) -> BaseModel:
+    if isinstance(item, bytes):
+        return schema.model_validate_json(item)
+    return schema.model_validate(item)
+
+
+async def create_many(
+    session: AsyncSession,
+    request: Request,
+    schema: type[BaseModel],
+    insert_chunk: Callable[[list], Awaitable[list[int]]],
+) -> models.BulkResult:
+    result = models.BulkResult()
+    chunk: list[tuple[int, BaseModel]] = []
+
+    async def flush():
+        # each chunk is its own transaction, a failing chunk does not undo the others
+        try:
+            created_ids = await insert_chunk([item for _, item in chunk])
+            await session.commit()
+        except SQLAlchemyError as e:
+            await session.rollback()
+            logger.warning(
+                "Bulk chunk failed", extra=dict(rows=len(chunk), error=str(e))
+            )
+            result.errors.extend(
+                models.BulkError(index=index, detail="Could not be stored")
+                for index, _ in chunk
+            )
+        else:
+            result.created_ids.extend(created_ids)
+        chunk.clear()
+
+    async for index, item in read_items(request):
+        if index >= settings.BULK_MAX_ROWS:
+            result.errors.append(
+                models.BulkError(
+                    index=index,
+                    detail=f"At most {settings.BULK_MAX_ROWS} rows per request",
+                )
+            )
+            break
+
+        try:
+            chunk.append((index, validate(schema, item)))
+        except ValidationError as e:
+            result.errors.append(
+                models.BulkError(
+                    index=index, detail=json.loads(e.json(include_url=False))
+                )
+            )
+
+        if len(chunk) >= settings.BULK_CHUNK_SIZE:
+            await flush()
+
+    if chunk:
+        await flush()
+
+    return result
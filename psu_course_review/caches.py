@@ -0,0 +1,68 @@
+import importlib
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class CacheBackend:
+    def __init__(self, namespace: str = "", max_size: int = 1024, ttl: float = 60):
+        self.namespace = namespace
+        self.max_size = max_size
+        self.ttl = ttl
+
+    async def get(self, key: Hashable) -> Any | None:
+        raise NotImplementedError
+
+    async def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        raise NotImplementedError
+
+    async def delete(self, key: Hashable):
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    def __init__(self, namespace: str = "", max_size: int = 1024, ttl: float = 60):
+        super().__init__(namespace=namespace, max_size=max_size, ttl=ttl)
+        self._items: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+
+    async def get(self, key: Hashable) -> Any | None:
+        item = self._items.get(key)
+        if item is None:
+            return None
+
+        value, expires_at = item
+        if expires_at <= time.monotonic():
+            self._items.pop(key, None)
+            return None
+
+        self._items.move_to_end(key)
+        return value
+
+    async def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else ttl
+        self._items[key] = (value, time.monotonic() + ttl)
+        self._items.move_to_end(key)
+
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    async def delete(self, key: Hashable):
+        self._items.pop(key, None)
+
+    async def clear(self):
+        self._items.clear()
+
+
+def create_cache(
+    backend: str, namespace: str, max_size: int = 1024, ttl: float = 60
+) -> CacheBackend:
+    # "memory" or a "package.module:ClassName" CacheBackend for a shared store
+    if backend == "memory":
+        return MemoryCache(namespace=namespace, max_size=max_size, ttl=ttl)
+
+    module_name, _, class_name = backend.partition(":")
+    cache_class = getattr(importlib.import_module(module_name), class_name)
+    return cache_class(namespace=namespace, max_size=max_size, ttl=ttl)
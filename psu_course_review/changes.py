@@ -0,0 +1,181 @@
+import datetime
+import time
+
+from fastapi import HTTPException, status
+from sqlalchemy import BigInteger, DateTime, Text, and_, cast, insert, literal, or_
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import config
+from . import models
+from . import pagination
+
+
+settings = config.get_settings()
+
+RESOURCES = {
+    models.DBReviewPost: "review_posts",
+    models.DBComment: "comments",
+    models.DBEvent: "events",
+}
+
+MODELS = {resource: model for model, resource in RESOURCES.items()}
+
+
+def _as_bigint(expression):
+    # xid8 has no direct cast to bigint
+    return cast(cast(expression, Text), BigInteger)
+
+
+def _txid(session: AsyncSession):
+    # PostgreSQL assigns ids at INSERT but shows the rows at COMMIT, so the
+    # position starts with the writing transaction. SQLite serializes writers,
+    # there the id order already is the commit order.
+    if session.bind.dialect.name == "postgresql":
+        return _as_bigint(func.pg_current_xact_id())
+    return literal(0, BigInteger)
+
+
+def _visible(session: AsyncSession):
+    # only transactions older than every running one are final, a running one
+    # may still add entries below the positions handed out
+    if session.bind.dialect.name == "postgresql":
+        xmin = _as_bigint(func.pg_snapshot_xmin(func.pg_current_snapshot()))
+        return models.DBChange.txid < select(xmin).scalar_subquery()
+    return literal(True)
+
+
+def record(session: AsyncSession, model, row_id: int, deleted: bool = False):
+    # written in the caller's transaction, so a rolled back write leaves no entry
+    resource = RESOURCES.get(model)
+    if resource is None:
+        return
+
+    session.add(
+        models.DBChange(
+            resource=resource, row_id=row_id, deleted=deleted, txid=_txid(session)
+        )
+    )
+
+
+def record_many(session: AsyncSession, model, row_ids: list[int]):
+    resource = RESOURCES.get(model)
+    if resource is None:
+        return
+
+    session.add_all(
+        models.DBChange(resource=resource, row_id=row_id, txid=_txid(session))
+        for row_id in row_ids
+    )
+
+
+async def record_deleted(session: AsyncSession, model, *criteria):
+    # tombstones for rows removed in bulk, e.g. by a cascade, in one INSERT ... SELECT
+    resource = RESOURCES.get(model)
+    if resource is None:
+        return
+
+    await session.exec(
+        insert(models.DBChange).from_select(
+            ["resource", "row_id", "deleted", "txid", "created_at"],
+            select(
+                literal(resource),
+                model.id,
+                literal(True),
+                _txid(session),
+                literal(datetime.datetime.now(), DateTime),
+            ).where(*criteria),
+        )
+    )
+
+
+def decode_token(token: str | None) -> tuple[int, int]:
+    if token is None:
+        return 0, 0
+
+    keys = pagination.decode_cursor(token)
+    txid, last_id, issued_at = keys.get("txid"), keys.get("id"), keys.get("at")
+    if not all(isinstance(value, int) for value in [txid, last_id, issued_at]):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync token"
+        )
+
+    # tombstones older than the retention are compacted away, so a client that
+    # has been away longer could miss deletes
+    retention = settings.SYNC_TOMBSTONE_RETENTION_DAYS * 24 * 60 * 60
+    if issued_at < time.time() - retention:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Sync token expired, sync again without one",
+        )
+
+    return txid, last_id
+
+
+def encode_token(txid: int, last_id: int) -> str:
+    return pagination.encode_cursor(txid=txid, id=last_id, at=int(time.time()))
+
+
+async def read_changes(
+    session: AsyncSession, since: str | None = None, limit: int = 100
+) -> models.ChangeList:
+    txid, last_id = decode_token(since)
+    change = models.DBChange
+
+    after = or_(change.txid > txid, and_(change.txid == txid, change.id > last_id))
+
+    # only the latest entry of each row matters, older ones are superseded
+    latest = (
+        select(func.max(change.id).label("id"))
+        .where(after, _visible(session))
+        .group_by(change.resource, change.row_id)
+        .subquery()
+    )
+    query = (
+        select(change)
+        .join(latest, latest.c.id == change.id)
+        .order_by(change.txid, change.id)
+        .limit(limit + 1)
+    )
+    entries = (await session.exec(query)).all()
+
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    changed = {resource: [] for resource in MODELS}
+    deleted = []
+    for entry in entries:
+        if entry.deleted:
+            deleted.append(models.Tombstone(resource=entry.resource, id=entry.row_id))
+        else:
+            changed[entry.resource].append(entry.row_id)
+
+    rows = {}
+    for resource, ids in changed.items():
+        if not ids:
+            rows[resource] = []
+            continue
+
+        model = MODELS[resource]
+        result = await session.exec(select(model).where(model.id.in_(ids)))
+        found = {row.id: row for row in result.all()}
+
+        # a row deleted after its entry was read is reported as deleted
+        rows[resource] = [found[row_id] for row_id in ids if row_id in found]
+        deleted.extend(
+            models.Tombstone(resource=resource, id=row_id)
+            for row_id in ids
+            if row_id not in found
+        )
+
+    if entries:
+        txid, last_id = entries[-1].txid, entries[-1].id
+
+    return models.ChangeList.model_validate(
+        dict(
+            **rows,
+            deleted=deleted,
+            next_token=encode_token(txid, last_id),
+            has_more=has_more,
+        )
+    )
@@ -8,10 +8,76 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30 * 60  # 30 minutes
     REFRESH_TOKEN_EXPIRE_MINUTES: int = 7 * 24 * 60  # 7 days
 
+    SQLDB_ECHO: bool = False
+    SQLDB_POOL_SIZE: int = 5
+    SQLDB_MAX_OVERFLOW: int = 10
+    SQLDB_POOL_TIMEOUT: int = 30
+    SQLDB_POOL_RECYCLE: int = 30 * 60  # 30 minutes
+    SQLDB_POOL_PRE_PING: bool = True
+    SQLDB_STATEMENT_CACHE_SIZE: int = 100  # asyncpg prepared statements
+
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "json" or "text"
+    # per-logger overrides, e.g. {"psu_course_review.deps": "DEBUG"}
+    LOG_LEVELS: dict[str, str] = {}
+    # fraction of INFO/DEBUG records kept per extra={"event": ...}
+    LOG_SAMPLE_RATES: dict[str, float] = {
+        "auth.authenticated": 0.01,
+        "auth.rejected": 0.1,
+    }
+
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # "thread" or "process"
+    PASSWORD_HASH_MAX_WORKERS: int = 4
+    # calls beyond this many waiting for a worker are shed with a 429
+    PASSWORD_HASH_MAX_QUEUE: int = 32
+
+    # token buckets for /token and /users/create
+    # "memory" or "package.module:ClassName" of a ratelimit.RateLimitBackend
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_IP_PER_MINUTE: float = 60
+    RATE_LIMIT_IP_BURST: int = 20
+    RATE_LIMIT_USERNAME_PER_MINUTE: float = 10
+    RATE_LIMIT_USERNAME_BURST: int = 5
+    RATE_LIMIT_MAX_KEYS: int = 100_000
+
+    # likes are coalesced in memory and written every interval, 0 writes through
+    LIKE_FLUSH_INTERVAL_SECONDS: float = 1.0
+
+    # "memory" or "package.module:ClassName" of a caches.CacheBackend
+    CACHE_BACKEND: str = "memory"
+
+    COUNT_CACHE_TTL_SECONDS: int = 60
+    COUNT_CACHE_MAX_SIZE: int = 10_000
+
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_SIZE: int = 10_000
+
+    TOKEN_CACHE_MAX_SIZE: int = 10_000
+
+    # "memory", "database" or "package.module:ClassName" of a revocation.RevocationStore
+    REVOCATION_STORE: str = "database"
+    # how long a token the store did not know stays trusted without asking again
+    REVOCATION_CHECK_TTL_SECONDS: int = 5
+    REVOCATION_PRUNE_INTERVAL_SECONDS: int = 60 * 60
+
+    # tombstones are compacted away and sync tokens expire after this long
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = 30
+
+    # bulk imports are validated and committed this many rows at a time
+    BULK_CHUNK_SIZE: int = 500
+    BULK_MAX_ROWS: int = 10_000
+
+    # anonymous list pages, dropped on writes to the same router
+    RESPONSE_CACHE_TTL_SECONDS: int = 5
+    RESPONSE_CACHE_MAX_SIZE: int = 1_000
+    # clients revalidate with If-None-Match once max-age has passed
+    HTTP_CACHE_MAX_AGE_SECONDS: int = 0
+
     model_config = SettingsConfigDict(
         env_file=".env", validate_assignment=True, extra="allow"
     )
 
 
 def get_settings():
-    return Settings()
\ No newline at end of file
+    return Settings()
@@ -0,0 +1,107 @@
+import datetime
+import time
+
+from sqlmodel import select, func, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import caches
+from . import changes
+from . import config
+
+
+settings = config.get_settings()
+
+
+class RowCountCache:
+    def __init__(self, ttl: float = 60, max_size: int = 10_000):
+        self.ttl = ttl
+        # (count, expires_at), filter values come from clients so the LRU bounds them
+        self._counts = caches.MemoryCache("row_counts", max_size=max_size, ttl=ttl)
+        # bumped by invalidate, the previous generation's counts just age out
+        self._generations: dict[str, int] = {}
+        # bumped by every write, a count read across one is not stored
+        self._writes: dict[str, int] = {}
+        # the filter columns each table has been counted by, so a write only
+        # looks up the counts its row can be part of
+        self._columns: dict[str, set[tuple[str, ...]]] = {}
+
+    def _key(self, table: str, filters: tuple) -> tuple:
+        return (table, self._generations.get(table, 0), filters)
+
+    async def get(self, session: AsyncSession, model, **filters) -> int:
+        table = model.__tablename__
+        key = self._key(table, tuple(sorted(filters.items())))
+        cached = await self._counts.get(key)
+        if cached is not None:
+            return cached[0]
+
+        writes = self._writes.get(table, 0)
+
+        query = select(func.count(model.id))
+        for name, value in filters.items():
+            query = query.where(getattr(model, name) == value)
+        count = (await session.exec(query)).first()
+
+        # a write committed while counting may or may not be included, drop it
+        if writes == self._writes.get(table, 0):
+            self._columns.setdefault(table, set()).add(tuple(sorted(filters)))
+            await self._counts.set(key, (count, time.monotonic() + self.ttl))
+
+        return count
+
+    async def adjust(self, model, row, delta: int):
+        table = model.__tablename__
+        self._writes[table] = self._writes.get(table, 0) + 1
+
+        for columns in self._columns.get(table, ()):
+            key = self._key(
+                table, tuple((column, getattr(row, column)) for column in columns)
+            )
+            cached = await self._counts.get(key)
+            if cached is None:
+                continue
+
+            # keeps the original expiry, drift from other workers still ages out
+            count, expires_at = cached
+            ttl = expires_at - time.monotonic()
+            if ttl > 0:
+                await self._counts.set(key, (count + delta, expires_at), ttl=ttl)
+
+    async def invalidate(self, model=None):
+        if model is None:
+            await self._counts.clear()
+            tables = list(self._writes)
+        else:
+            table = model.__tablename__
+            self._generations[table] = self._generations.get(table, 0) + 1
+            tables = [table]
+
+        for table in tables:
+            self._writes[table] = self._writes.get(table, 0) + 1
+
+
+async def increment(
+    session: AsyncSession, model, row_id: int, column: str, delta: int = 1
+) -> int:
+    attribute = getattr(model, column)
+    values = {attribute: attribute + delta}
+
+    # counters are part of the representation, so they move the row version too
+    version_column = model.__mapper__.version_id_col
+    if version_column is not None:
+        version = getattr(model, version_column.key)
+        values[version] = version + 1
+
+    # set explicitly rather than by onupdate, so loaded rows are synchronized too
+    if "updated_at" in model.__table__.c:
+        values[model.updated_at] = datetime.datetime.now()
+
+    result = await session.exec(update(model).where(model.id == row_id).values(values))
+    if result.rowcount:
+        changes.record(session, model, row_id)
+    return result.rowcount
+
+
+row_counts = RowCountCache(
+    ttl=settings.COUNT_CACHE_TTL_SECONDS, max_size=settings.COUNT_CACHE_MAX_SIZE
+)
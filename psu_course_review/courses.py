@@ -0,0 +1,177 @@
+import datetime
+
+from sqlalchemy import case, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select, delete, func, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import models
+
+
+_inserts = dict(postgresql=postgresql.insert, sqlite=sqlite.insert)
+
+
+def _latest(current, added):
+    return case(
+        ((current.is_(None)) | (added > current), added),
+        else_=current,
+    )
+
+
+async def _upsert(session: AsyncSession, row: dict):
+    course = models.DBCourse
+    dialect = session.bind.dialect.name
+
+    if dialect not in _inserts:
+        # no ON CONFLICT, update the course and only insert it when it is new
+        result = await session.exec(
+            update(course)
+            .where(course.course_code == row["course_code"])
+            .values(
+                course_name=row["course_name"],
+                review_posts_amount=course.review_posts_amount
+                + row["review_posts_amount"],
+                likes_amount=course.likes_amount + row["likes_amount"],
+                comments_amount=course.comments_amount + row["comments_amount"],
+                latest_review_date=_latest(
+                    course.latest_review_date, row["latest_review_date"]
+                ),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            await session.exec(insert(course).values(**row))
+        return
+
+    statement = _inserts[dialect](course).values(**row)
+    statement = statement.on_conflict_do_update(
+        index_elements=[course.course_code],
+        set_=dict(
+            course_name=statement.excluded.course_name,
+            review_posts_amount=course.review_posts_amount
+            + statement.excluded.review_posts_amount,
+            likes_amount=course.likes_amount + statement.excluded.likes_amount,
+            comments_amount=course.comments_amount + statement.excluded.comments_amount,
+            latest_review_date=_latest(
+                course.latest_review_date, statement.excluded.latest_review_date
+            ),
+        ),
+    )
+    await session.exec(statement)
+
+
+async def add_review_posts(session: AsyncSession, review_posts: list):
+    # one upsert per course, however many of its posts are added
+    values = {}
+    for review_post in review_posts:
+        row = values.setdefault(
+            review_post.course_code,
+            dict(
+                course_code=review_post.course_code,
+                review_posts_amount=0,
+                likes_amount=0,
+                comments_amount=0,
+                latest_review_date=None,
+            ),
+        )
+        row["course_name"] = review_post.course_name
+        row["review_posts_amount"] += 1
+        row["likes_amount"] += review_post.likes_amount
+        row["comments_amount"] += review_post.comments_amount
+
+        # the post's own date, a post moved from another course keeps its age
+        created_at = review_post.created_at or datetime.datetime.now()
+        if row["latest_review_date"] is None or created_at > row["latest_review_date"]:
+            row["latest_review_date"] = created_at
+
+    for row in values.values():
+        await _upsert(session, row)
+
+
+async def add_review_post(session: AsyncSession, review_post):
+    await add_review_posts(session, [review_post])
+
+
+async def remove_review_post(session: AsyncSession, review_post):
+    course = models.DBCourse
+    other_review_post = models.DBReviewPost
+
+    latest_review_date = (
+        select(func.max(other_review_post.created_at))
+        .where(
+            other_review_post.course_code == review_post.course_code,
+            other_review_post.id != review_post.id,
+        )
+        .scalar_subquery()
+    )
+    await session.exec(
+        update(course)
+        .where(course.course_code == review_post.course_code)
+        .values(
+            review_posts_amount=course.review_posts_amount - 1,
+            likes_amount=course.likes_amount - review_post.likes_amount,
+            comments_amount=course.comments_amount - review_post.comments_amount,
+            latest_review_date=latest_review_date,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def rename(session: AsyncSession, course_code: str, course_name: str):
+    course = models.DBCourse
+    await session.exec(
+        update(course)
+        .where(course.course_code == course_code)
+        .values(course_name=course_name)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def rebuild(session: AsyncSession) -> int:
+    # recomputes every course from its review posts, for databases that
+    # predate the table or drifted from it
+    course = models.DBCourse
+    review_post = models.DBReviewPost
+
+    await session.exec(delete(course))
+    result = await session.exec(
+        insert(course).from_select(
+            [
+                "course_code",
+                "course_name",
+                "review_posts_amount",
+                "likes_amount",
+                "comments_amount",
+                "latest_review_date",
+            ],
+            select(
+                review_post.course_code,
+                func.max(review_post.course_name),
+                func.count(review_post.id),
+                func.sum(review_post.likes_amount),
+                func.sum(review_post.comments_amount),
+                func.max(review_post.created_at),
+            ).group_by(review_post.course_code),
+        )
+    )
+    await session.commit()
+    return result.rowcount
+
+
+async def increment_for_review_post(
+    session: AsyncSession, review_post_id: int, column: str, delta: int = 1
+):
+    course = models.DBCourse
+    attribute = getattr(course, column)
+
+    course_code = (
+        select(models.DBReviewPost.course_code)
+        .where(models.DBReviewPost.id == review_post_id)
+        .scalar_subquery()
+    )
+    await session.exec(
+        update(course)
+        .where(course.course_code == course_code)
+        .values({attribute: attribute + delta})
+        .execution_options(synchronize_session=False)
+    )
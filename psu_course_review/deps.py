@@ -1,6 +1,9 @@
 from fastapi import Depends, HTTPException, status, Path, Query
 from fastapi.security import OAuth2PasswordBearer
 
+import hashlib
+import logging
+import time
 import typing
 import jwt
 
@@ -9,55 +12,125 @@ from pydantic import ValidationError
 from . import models
 from . import security
 from . import config
+from . import caches
+from . import revocation
+
+logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
 settings = config.get_settings()
 
+user_cache = caches.create_cache(
+    settings.CACHE_BACKEND,
+    "users",
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
 
-async def get_current_user(
+
+# verified claims by token digest, each entry lives until the token's exp
+token_cache = caches.create_cache(
+    settings.CACHE_BACKEND,
+    "tokens",
+    max_size=settings.TOKEN_CACHE_MAX_SIZE,
+    ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
+
+
+async def invalidate_user(user_id: int):
+    await user_cache.delete(user_id)
+
+
+async def decode_token(token: str) -> dict:
+    key = hashlib.blake2b(token.encode("utf-8"), digest_size=16).hexdigest()
+
+    payload = await token_cache.get(key)
+    if payload is None:
+        payload = jwt.decode(
+            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
+        )
+
+        ttl = payload.get("exp", 0) - time.time()
+        if ttl > 0:
+            await token_cache.set(key, payload, ttl=ttl)
+
+    elif payload.get("exp", 0) <= time.time():
+        raise jwt.ExpiredSignatureError("Signature has expired")
+
+    return payload
+
+
+async def get_current_claims(
     token: typing.Annotated[str, Depends(oauth2_scheme)],
-    session: typing.Annotated[models.AsyncSession, Depends(models.get_session)],
-) -> models.User:
+) -> models.TokenClaims:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
-        )
-        user_id: int = payload.get("sub")
+        payload = await decode_token(token)
+        claims = models.TokenClaims.model_validate(payload)
 
-        print("payload", payload)
-        print("user_id", user_id)
+        if claims.type != "access":
+            raise jwt.InvalidTokenError("Not an access token")
 
-        if user_id is None:
-            raise credentials_exception
+        # a logout or a replayed refresh token on another worker counts too
+        for jti in (claims.jti, claims.fam):
+            if await revocation.revoked_tokens.is_revoked_anywhere(jti, claims.exp):
+                raise jwt.InvalidTokenError("Token has been revoked")
 
-    except jwt.PyJWTError as e:
-        print(e)
+    except (jwt.PyJWTError, ValidationError) as e:
+        logger.info(
+            "Rejected access token", extra=dict(event="auth.rejected", error=str(e))
+        )
         raise credentials_exception
 
-    user = await session.get(models.DBUser, user_id)
-    if user is None:
-        raise credentials_exception
+    logger.debug(
+        "Authenticated request",
+        extra=dict(event="auth.authenticated", user_id=claims.sub),
+    )
+
+    return claims
+
+
+async def get_current_user(
+    claims: typing.Annotated[models.TokenClaims, Depends(get_current_claims)],
+    session: typing.Annotated[models.AsyncSession, Depends(models.get_session)],
+) -> models.AuthenticatedUser:
+    user_id = claims.sub
+
+    cached_user = await user_cache.get(user_id)
+    if cached_user is not None:
+        return models.AuthenticatedUser.model_validate(cached_user)
+
+    db_user = await session.get(models.DBUser, user_id)
+    if db_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    user = models.AuthenticatedUser.model_validate(db_user)
+    await user_cache.set(user_id, user.model_dump(mode="json"))
 
     return user
 
 
+# authorized from the access token claims alone, without loading the user
 async def get_current_active_user(
-    current_user: typing.Annotated[models.User, Depends(get_current_user)]
-) -> models.User:
+    current_user: typing.Annotated[models.TokenClaims, Depends(get_current_claims)]
+) -> models.TokenClaims:
     if current_user.status != "active":
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
 
 async def get_current_active_superuser(
-    current_user: typing.Annotated[models.User, Depends(get_current_user)]
-) -> models.User:
+    current_user: typing.Annotated[models.TokenClaims, Depends(get_current_claims)]
+) -> models.TokenClaims:
     if "admin" not in current_user.roles:
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
@@ -71,10 +144,13 @@ class RoleChecker:
 
     def __call__(
         self,
-        user: typing.Annotated[models.User, Depends(get_current_active_user)],
+        user: typing.Annotated[models.TokenClaims, Depends(get_current_active_user)],
     ):
         for role in user.roles:
             if role in self.allowed_roles:
                 return
-        # logger.debug(f"User with role {user.roles} not in {self.allowed_roles}")
+        logger.debug(
+            "Role not permitted",
+            extra=dict(roles=user.roles, allowed_roles=self.allowed_roles),
+        )
         raise HTTPException(status_code=403, detail="Role not permitted")
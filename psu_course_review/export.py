@@ -0,0 +1,64 @@
+import csv
+import datetime
+import io
+import json
+from typing import AsyncIterator
+
+from pydantic import BaseModel
+from sqlmodel import select
+
+from . import models
+
+
+MEDIA_TYPES = dict(ndjson="application/x-ndjson", csv="text/csv")
+
+# rows buffered per chunk written to the client, and fetched per round trip
+CHUNK_SIZE = 500
+
+
+def naive_local_time(value: datetime.datetime) -> datetime.datetime:
+    # updated_at is stored as naive local time, comparing an aware datetime with
+    # it fails on asyncpg and silently compares wall clocks on SQLite
+    if value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+def _csv_line(values: list) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+async def stream_rows(
+    model,
+    schema: type[BaseModel],
+    format: str = "ndjson",
+    since: datetime.datetime | None = None,
+) -> AsyncIterator[str]:
+    query = select(model).order_by(model.id).execution_options(yield_per=CHUNK_SIZE)
+    if since is not None:
+        query = query.where(model.updated_at >= naive_local_time(since))
+
+    fields = list(schema.model_fields)
+    if format == "csv":
+        yield _csv_line(fields)
+
+    # the response outlives request dependencies, so the stream owns its session
+    async with models.session_factory() as session:
+        result = await session.stream(query)
+
+        lines = []
+        async for row in result.scalars():
+            data = schema.model_validate(row).model_dump(mode="json")
+            if format == "csv":
+                lines.append(_csv_line([data[field] for field in fields]))
+            else:
+                lines.append(json.dumps(data) + "\n")
+
+            if len(lines) >= CHUNK_SIZE:
+                yield "".join(lines)
+                lines = []
+
+        if lines:
+            yield "".join(lines)
@@ -0,0 +1,137 @@
+import hashlib
+import uuid
+
+from fastapi import HTTPException, Request, Response, status
+from pydantic import BaseModel
+
+from . import caches
+from . import config
+
+
+settings = config.get_settings()
+
+response_cache = caches.create_cache(
+    settings.CACHE_BACKEND,
+    "responses",
+    max_size=settings.RESPONSE_CACHE_MAX_SIZE,
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+)
+
+# kept far longer than the pages, a lost generation only orphans them early
+GENERATION_TTL_SECONDS = 24 * 60 * 60
+
+
+def _generation_key(namespace: str) -> tuple:
+    return ("generation", namespace)
+
+
+async def _generation(namespace: str) -> str:
+    # stored in the response cache itself, so with a shared backend a write on
+    # one worker orphans the pages cached by every worker
+    key = _generation_key(namespace)
+    generation = await response_cache.get(key)
+    if generation is None:
+        # never a fixed initial value, pages of an evicted generation stay orphaned
+        generation = uuid.uuid4().hex
+        await response_cache.set(key, generation, ttl=GENERATION_TTL_SECONDS)
+    return generation
+
+
+async def invalidate(*namespaces: str):
+    # a new generation orphans every cached page of the namespace
+    for namespace in namespaces:
+        await response_cache.set(
+            _generation_key(namespace), uuid.uuid4().hex, ttl=GENERATION_TTL_SECONDS
+        )
+
+
+def make_etag(data: bytes) -> str:
+    return '"' + hashlib.blake2b(data, digest_size=16).hexdigest() + '"'
+
+
+def row_etag(row) -> str:
+    return f'"{row.id}-{row.version}"'
+
+
+def cache_headers(etag: str) -> dict:
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.HTTP_CACHE_MAX_AGE_SECONDS}",
+    }
+
+
+def etag_matches(header: str | None, etag: str) -> bool:
+    if not header:
+        return False
+
+    if header.strip() == "*":
+        return True
+
+    return etag in [tag.strip() for tag in header.split(",")]
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    return etag_matches(request.headers.get("if-none-match"), etag)
+
+
+def precondition_failed() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Resource has been modified",
+    )
+
+
+def check_if_match(if_match: str | None, etag: str):
+    if if_match is not None and not etag_matches(if_match, etag):
+        raise precondition_failed()
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag)
+    )
+
+
+async def _cache_key(request: Request, namespace: str) -> tuple | None:
+    # only anonymous pages are shared between clients
+    if "authorization" in request.headers:
+        return None
+    return (namespace, await _generation(namespace), str(request.url))
+
+
+def _list_response(request: Request, body: bytes, etag: str) -> Response:
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    return Response(
+        content=body, media_type="application/json", headers=cache_headers(etag)
+    )
+
+
+async def get_list_response(
+    request: Request, namespace: str
+) -> tuple[tuple | None, Response | None]:
+    # the key is taken before the handler reads anything, a write that
+    # invalidates meanwhile then orphans the page built from the older rows
+    key = await _cache_key(request, namespace)
+    if key is None:
+        return None, None
+
+    cached = await response_cache.get(key)
+    if cached is None:
+        return key, None
+
+    body, etag = cached
+    return key, _list_response(request, body, etag)
+
+
+async def list_response(
+    request: Request, key: tuple | None, payload: BaseModel
+) -> Response:
+    body = payload.model_dump_json().encode("utf-8")
+    etag = make_etag(body)
+
+    if key is not None:
+        await response_cache.set(key, (body, etag))
+
+    return _list_response(request, body, etag)
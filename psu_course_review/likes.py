@@ -0,0 +1,185 @@
+import asyncio
+import collections
+import logging
+
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import config
+from . import counters
+from . import courses
+from . import http_cache
+from . import models
+
+
+logger = logging.getLogger(__name__)
+
+settings = config.get_settings()
+
+# cached list pages that show a model's likes_amount
+CACHE_NAMESPACES = {
+    models.DBReviewPost: ("review_posts", "courses"),
+    models.DBComment: ("comments",),
+    models.DBEvent: ("events",),
+}
+
+
+async def increment_likes(session: AsyncSession, model, row_id: int, delta: int):
+    await counters.increment(session, model, row_id, "likes_amount", delta)
+    if model is models.DBReviewPost:
+        await courses.increment_for_review_post(session, row_id, "likes_amount", delta)
+
+
+class LikeBuffer:
+    def __init__(self, flush_interval: float = 1.0):
+        self.flush_interval = flush_interval
+        self._pending: collections.Counter = collections.Counter()
+        self._task: asyncio.Task | None = None
+        self._stopping: asyncio.Event | None = None
+
+    @property
+    def write_through(self) -> bool:
+        return self.flush_interval <= 0
+
+    def add(self, model, row_id: int, delta: int):
+        self._pending[(model, row_id)] += delta
+
+    def pending(self, model, row_id: int) -> int:
+        return self._pending.get((model, row_id), 0)
+
+    async def flush(self):
+        pending, self._pending = self._pending, collections.Counter()
+        pending = {key: delta for key, delta in pending.items() if delta}
+        if not pending:
+            return
+
+        try:
+            async with models.session_factory() as session:
+                for (model, row_id), delta in pending.items():
+                    await increment_likes(session, model, row_id, delta)
+                await session.commit()
+        except Exception:
+            # keep the deltas for the next round instead of dropping likes
+            self._pending.update(pending)
+            logger.exception("Failed to flush likes", extra=dict(rows=len(pending)))
+        except BaseException:
+            # cancelled, the transaction is rolled back, so the deltas are kept too
+            self._pending.update(pending)
+            raise
+        else:
+            for model in {model for model, _ in pending}:
+                await http_cache.invalidate(*CACHE_NAMESPACES.get(model, ()))
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    def start(self):
+        if self._task is None and not self.write_through:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # never cancelled mid-flush, the loop finishes its round and flushes once more
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+like_buffer = LikeBuffer(flush_interval=settings.LIKE_FLUSH_INTERVAL_SECONDS)
+
+
+async def like(
+    session: AsyncSession,
+    model,
+    target_type: str,
+    target_id: int,
+    user_id: int,
+    not_found_detail: str = "Not found",
+) -> models.LikeStatus:
+    db_target = await session.get(model, target_id)
+    if db_target is None:
+        raise HTTPException(status_code=404, detail=not_found_detail)
+
+    # the unique (user_id, target_type, target_id) row makes liking idempotent
+    session.add(
+        models.DBLike(user_id=user_id, target_type=target_type, target_id=target_id)
+    )
+    try:
+        if like_buffer.write_through:
+            await increment_likes(session, model, target_id, 1)
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        await session.refresh(db_target)
+    else:
+        if like_buffer.write_through:
+            await http_cache.invalidate(*CACHE_NAMESPACES.get(model, ()))
+        else:
+            like_buffer.add(model, target_id, 1)
+
+    return models.LikeStatus(
+        liked=True,
+        likes_amount=db_target.likes_amount + like_buffer.pending(model, target_id),
+    )
+
+
+async def unlike(
+    session: AsyncSession,
+    model,
+    target_type: str,
+    target_id: int,
+    user_id: int,
+    not_found_detail: str = "Not found",
+) -> models.LikeStatus:
+    db_target = await session.get(model, target_id)
+    if db_target is None:
+        raise HTTPException(status_code=404, detail=not_found_detail)
+
+    result = await session.exec(
+        delete(models.DBLike).where(
+            models.DBLike.user_id == user_id,
+            models.DBLike.target_type == target_type,
+            models.DBLike.target_id == target_id,
+        )
+    )
+    if result.rowcount:
+        if like_buffer.write_through:
+            await increment_likes(session, model, target_id, -1)
+        await session.commit()
+        if like_buffer.write_through:
+            await http_cache.invalidate(*CACHE_NAMESPACES.get(model, ()))
+        else:
+            like_buffer.add(model, target_id, -1)
+
+    return models.LikeStatus(
+        liked=False,
+        likes_amount=db_target.likes_amount + like_buffer.pending(model, target_id),
+    )
+
+
+async def delete_likes_of(session: AsyncSession, target_type: str, target_ids):
+    # target_ids is a list or a SELECT of ids
+    await session.exec(
+        delete(models.DBLike).where(
+            models.DBLike.target_type == target_type,
+            models.DBLike.target_id.in_(target_ids),
+        )
+    )
+
+
+async def delete_likes(session: AsyncSession, target_type: str, target_id: int):
+    await session.exec(
+        delete(models.DBLike).where(
+            models.DBLike.target_type == target_type,
+            models.DBLike.target_id == target_id,
+        )
+    )
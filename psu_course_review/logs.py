@@ -0,0 +1,108 @@
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+
+
+ROOT_LOGGER = "psu_course_review"
+
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = dict(
+            time=self.formatTime(record),
+            level=record.levelname,
+            logger=record.name,
+            message=record.getMessage(),
+        )
+
+        # anything passed through extra={...} becomes a structured field
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+
+        # exc_text when the record came through the queue
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+
+        return json.dumps(entry, default=str)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    # the stock prepare() formats the record, traceback included, into its
+    # message, the formatter behind the queue gets it as a separate field
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+
+        # text rather than the traceback objects, the frames are not kept alive
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, sample_rates: dict[str, float]):
+        super().__init__()
+        self.sample_rates = sample_rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        rate = self.sample_rates.get(getattr(record, "event", None))
+        if rate is None:
+            return True
+
+        return random.random() < rate
+
+
+def setup_logging(settings):
+    global _listener
+
+    if _listener is not None:
+        return
+
+    if settings.LOG_FORMAT == "json":
+        formatter = JSONFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    # request handlers only enqueue, a background thread does the blocking write
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATES))
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.handlers = [queue_handler]
+    logger.setLevel(settings.LOG_LEVEL)
+    logger.propagate = False
+
+    for name, level in settings.LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+
+
+def shutdown_logging():
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -3,21 +3,35 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from . import config
+from . import logs
 
+from . import likes
 from . import models
+from . import passwords
+from . import revocation
 
 from . import routers
 
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await models.create_table()
+    await revocation.revoked_tokens.load()
+    likes.like_buffer.start()
     yield
+    # Shutdown
+    await likes.like_buffer.stop()
+    await models.close_session()
+    passwords.hasher.shutdown()
+    logs.shutdown_logging()
 
 
 def create_app(settings=None):
     if not settings:
         settings = config.get_settings()
+    logs.setup_logging(settings)
+
     app = FastAPI(lifespan=lifespan)
 
     app.add_middleware(
@@ -0,0 +1,290 @@
+import datetime
+import logging
+
+from sqlalchemy import bindparam, exists, inspect, text
+from sqlalchemy.engine import Connection
+from sqlmodel import SQLModel, select, delete, func, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import changes
+from . import config
+from . import likes
+from . import models
+
+
+logger = logging.getLogger(__name__)
+
+settings = config.get_settings()
+
+
+async def purge_orphan_comments(session: AsyncSession, batch_size: int = 1000) -> int:
+    # comments left behind by review posts deleted before ON DELETE CASCADE
+    orphaned = ~exists().where(
+        models.DBReviewPost.id == models.DBComment.review_post_id
+    )
+
+    purged = 0
+    while True:
+        result = await session.exec(
+            select(models.DBComment.id).where(orphaned).limit(batch_size)
+        )
+        comment_ids = result.all()
+        if not comment_ids:
+            break
+
+        # short transactions, so writers are never blocked for the whole purge
+        in_batch = models.DBComment.id.in_(comment_ids)
+        await changes.record_deleted(session, models.DBComment, in_batch)
+        await likes.delete_likes_of(session, "comment", comment_ids)
+        await session.exec(delete(models.DBComment).where(in_batch))
+        await session.commit()
+
+        purged += len(comment_ids)
+        logger.info("Purged orphan comments", extra=dict(purged=purged))
+
+    return purged
+
+
+def _backfill_value(column):
+    # what rows that predate the column get, the same value a new row would
+    default = column.default
+    if default is None:
+        return None
+    if default.is_callable:
+        # e.g. datetime.now, the time of the upgrade is the best guess left
+        return default.arg(None)
+    if default.is_scalar:
+        return default.arg
+    return None
+
+
+def find_duplicates(connection: Connection) -> dict[str, list]:
+    # values a unique index would reject, written before the index existed,
+    # e.g. emails, which the first release never checked
+    inspector = inspect(connection)
+    duplicates = {}
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            columns = list(index.columns)
+            if not index.unique or any(c.name not in existing for c in columns):
+                continue
+
+            result = connection.execute(
+                select(*columns).group_by(*columns).having(func.count() > 1)
+            )
+            values = [row[0] if len(row) == 1 else tuple(row) for row in result]
+            if values:
+                names = ", ".join(column.name for column in columns)
+                duplicates[f"{table.name}({names})"] = values
+
+    return duplicates
+
+
+def upgrade_schema(connection: Connection) -> list[str]:
+    # run with AsyncConnection.run_sync, create_all only creates missing tables
+
+    # checked before anything is changed, a unique index failing halfway
+    # would leave the schema half upgraded
+    duplicates = find_duplicates(connection)
+    if duplicates:
+        raise ValueError(
+            "Resolve the duplicates before upgrading: "
+            + "; ".join(
+                f"{name}: {', '.join(map(str, values))}"
+                for name, values in duplicates.items()
+            )
+        )
+
+    SQLModel.metadata.create_all(connection)
+
+    inspector = inspect(connection)
+    added = []
+    for table in SQLModel.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+
+            # added as nullable, NOT NULL is only set once every row has a value
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(
+                text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+            )
+
+            value = _backfill_value(column)
+            if value is not None:
+                connection.execute(
+                    text(f"UPDATE {table.name} SET {column.name} = :value").bindparams(
+                        bindparam("value", type_=column.type)
+                    ),
+                    dict(value=value),
+                ).close()
+            if not column.nullable and connection.dialect.name != "sqlite":
+                connection.execute(
+                    text(
+                        f"ALTER TABLE {table.name} ALTER COLUMN {column.name} "
+                        "SET NOT NULL"
+                    )
+                )
+
+            added.append(f"{table.name}.{column.name}")
+            logger.info(
+                "Added column", extra=dict(table=table.name, column=column.name)
+            )
+
+        # indexes are only created along with their table
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+    create_search_index(connection)
+
+    return added
+
+
+def create_search_index(connection: Connection):
+    # the full-text index is created by an after_create hook of review_posts
+    if connection.dialect.name == "postgresql":
+        for statement in models.POSTGRESQL_SEARCH_DDL:
+            connection.execute(text(statement))
+
+    elif connection.dialect.name == "sqlite":
+        if inspect(connection).has_table("review_posts_fts"):
+            return
+        for statement in models.SQLITE_SEARCH_DDL:
+            connection.execute(text(statement))
+        # index the posts that were written before the table existed
+        connection.execute(
+            text("INSERT INTO review_posts_fts(review_posts_fts) VALUES ('rebuild')")
+        )
+
+
+def cascade_comment_deletes(connection: Connection) -> bool:
+    # comments tables created before ON DELETE CASCADE, run after
+    # purge_orphan_comments so every comment still has its post
+    inspector = inspect(connection)
+    for foreign_key in inspector.get_foreign_keys("comments"):
+        if foreign_key["referred_table"] != "review_posts":
+            continue
+        if foreign_key["options"].get("ondelete", "").upper() == "CASCADE":
+            return False
+        break
+    else:
+        foreign_key = None
+
+    comments = models.DBComment.__table__
+    if connection.dialect.name == "sqlite":
+        # SQLite cannot alter a constraint, the table is rebuilt around it
+        for index in inspector.get_indexes("comments"):
+            connection.execute(text(f"DROP INDEX {index['name']}"))
+        connection.execute(text("ALTER TABLE comments RENAME TO comments_old"))
+        comments.create(connection)
+
+        columns = ", ".join(column.name for column in comments.columns)
+        connection.execute(
+            text(f"INSERT INTO comments ({columns}) SELECT {columns} FROM comments_old")
+        )
+        connection.execute(text("DROP TABLE comments_old"))
+    else:
+        name = (foreign_key or {}).get("name") or "comments_review_post_id_fkey"
+        if foreign_key is not None:
+            connection.execute(text(f"ALTER TABLE comments DROP CONSTRAINT {name}"))
+        connection.execute(
+            text(
+                f"ALTER TABLE comments ADD CONSTRAINT {name} "
+                "FOREIGN KEY (review_post_id) REFERENCES review_posts (id) "
+                "ON DELETE CASCADE"
+            )
+        )
+
+    logger.info("Added ON DELETE CASCADE", extra=dict(table="comments"))
+    return True
+
+
+async def recount_counters(session: AsyncSession):
+    # counters written before they were maintained atomically may be anything
+    user = models.DBUser
+    await session.exec(
+        update(user)
+        .values(
+            review_posts_amount=select(func.count(models.DBReviewPost.id))
+            .where(models.DBReviewPost.user_id == user.id)
+            .scalar_subquery(),
+            events_amount=select(func.count(models.DBEvent.id))
+            .where(models.DBEvent.user_id == user.id)
+            .scalar_subquery(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    review_post = models.DBReviewPost
+    comments_amount = (
+        select(func.count(models.DBComment.id))
+        .where(models.DBComment.review_post_id == review_post.id)
+        .scalar_subquery()
+    )
+    # only the posts whose count was wrong get a new version
+    await session.exec(
+        update(review_post)
+        .where(review_post.comments_amount != comments_amount)
+        .values(
+            comments_amount=comments_amount,
+            version=review_post.version + 1,
+            updated_at=datetime.datetime.now(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+
+
+async def normalize_course_codes(session: AsyncSession) -> int:
+    # posts written before course codes were normalized on input
+    review_post = models.DBReviewPost
+    result = await session.exec(select(review_post.course_code).distinct())
+
+    normalized = 0
+    for course_code in result.all():
+        normalized_code = models.normalize_course_code(course_code)
+        if normalized_code == course_code:
+            continue
+
+        result = await session.exec(
+            update(review_post)
+            .where(review_post.course_code == course_code)
+            .values(
+                course_code=normalized_code,
+                version=review_post.version + 1,
+                updated_at=datetime.datetime.now(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        normalized += result.rowcount
+
+    await session.commit()
+    return normalized
+
+
+async def compact_changes(session: AsyncSession) -> tuple[int, int]:
+    change = models.DBChange
+
+    # a superseded entry adds nothing, every client reaches the later one too
+    latest = select(func.max(change.id)).group_by(change.resource, change.row_id)
+    superseded = await session.exec(delete(change).where(change.id.not_in(latest)))
+
+    # sync tokens expire after the same retention, see changes.decode_token
+    cutoff = datetime.datetime.now() - datetime.timedelta(
+        days=settings.SYNC_TOMBSTONE_RETENTION_DAYS
+    )
+    expired = await session.exec(
+        delete(change).where(change.deleted, change.created_at < cutoff)
+    )
+    await session.commit()
+
+    logger.info(
+        "Compacted changes",
+        extra=dict(superseded=superseded.rowcount, expired=expired.rowcount),
+    )
+    return superseded.rowcount, expired.rowcount
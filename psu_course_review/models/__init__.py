@@ -4,50 +4,93 @@ from typing import AsyncIterator
 from sqlmodel import Field, SQLModel, create_engine, Session, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 
 from . import comments
+from . import courses
 from . import review_posts
 from . import users
 from . import events
+from . import likes
+from . import changes
+from . import bulk
+from . import tokens
 
 from .comments import *
+from .courses import *
 from .review_posts import *
 from .users import *
 from .events import *
+from .likes import *
+from .changes import *
+from .bulk import *
+from .tokens import *
 
 
 connect_args = {}
 
 engine = None
+session_factory = None
 
 
 def init_db(settings):
-    global engine
+    global engine, session_factory
 
-    engine = create_async_engine(
-        settings.SQLDB_URL,
-        echo=True,
+    url = make_url(settings.SQLDB_URL)
+    engine_args = dict(
+        echo=settings.SQLDB_ECHO,
         future=True,
-        connect_args=connect_args,
+        pool_pre_ping=settings.SQLDB_POOL_PRE_PING,
+        pool_recycle=settings.SQLDB_POOL_RECYCLE,
+        connect_args=dict(connect_args),
     )
 
+    if url.get_backend_name() == "sqlite":
+        # writers queue on the database file lock rather than on the pool
+        engine_args["connect_args"].setdefault("timeout", settings.SQLDB_POOL_TIMEOUT)
+    else:
+        engine_args.update(
+            pool_size=settings.SQLDB_POOL_SIZE,
+            max_overflow=settings.SQLDB_MAX_OVERFLOW,
+            pool_timeout=settings.SQLDB_POOL_TIMEOUT,
+        )
+
+    if url.get_driver_name() == "asyncpg":
+        statement_cache_size = settings.SQLDB_STATEMENT_CACHE_SIZE
+        engine_args["connect_args"]["statement_cache_size"] = statement_cache_size
+
+    engine = create_async_engine(url, **engine_args)
+
+    if url.get_backend_name() == "sqlite":
+        # SQLite only enforces foreign keys, and ON DELETE CASCADE, when asked to
+        event.listen(engine.sync_engine, "connect", enable_sqlite_foreign_keys)
+
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
 
 async def recreate_table():
     async with engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.drop_all)
         await conn.run_sync(SQLModel.metadata.create_all)
 
+
 async def create_table():
     async with engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
 
 
 async def get_session() -> AsyncIterator[AsyncSession]:
-    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-    async with async_session() as session:
+    async with session_factory() as session:
         yield session
 
 
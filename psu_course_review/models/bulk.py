@@ -0,0 +1,17 @@
+from typing import Any
+
+from pydantic import BaseModel, ConfigDict
+
+
+class BulkError(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    index: int
+    detail: Any
+
+
+class BulkResult(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    created_ids: list[int] = []
+    errors: list[BulkError] = []
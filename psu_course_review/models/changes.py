@@ -0,0 +1,43 @@
+import datetime
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import BigInteger
+from sqlmodel import SQLModel, Field, Index
+
+from .comments import Comment
+from .events import Event
+from .review_posts import ReviewPost
+
+
+class DBChange(SQLModel, table=True):
+    __tablename__ = "changes"
+    # (txid, id) is the sync position, see changes.read_changes
+    __table_args__ = (Index("ix_changes_txid_id", "txid", "id"),)
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    # the writing transaction on PostgreSQL, 0 where writers are serialized
+    txid: int = Field(default=0, sa_type=BigInteger)
+    created_at: datetime.datetime = Field(default_factory=datetime.datetime.now)
+
+    resource: str
+    row_id: int
+    deleted: bool = False
+
+
+class Tombstone(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    resource: str
+    id: int
+
+
+class ChangeList(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    review_posts: list[ReviewPost] = []
+    comments: list[Comment] = []
+    events: list[Event] = []
+    deleted: list[Tombstone] = []
+    next_token: str | None = None
+    has_more: bool = False
@@ -1,7 +1,9 @@
+import datetime
 from typing import Optional
 
 from pydantic import BaseModel, ConfigDict
-from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Column, Integer
+from sqlmodel import SQLModel, Field, Relationship, Index
 
 from . import users
 from . import review_posts
@@ -27,23 +29,49 @@ class UpdatedComment(BaseComment):
 
 class Comment(BaseComment):
     id: int
+    version: int = 1
+    created_at: datetime.datetime | None = None
+    updated_at: datetime.datetime | None = None
+
+
+# bumped on every write, ORM updates only match rows still at the loaded version
+_version_column = Column("version", Integer, nullable=False, default=1)
 
 
 class DBComment(BaseComment, SQLModel, table=True):
     __tablename__ = "comments"
+    # backs the per-post comment pages and the cascade from review_posts
+    __table_args__ = (Index("ix_comments_review_post_id_id", "review_post_id", "id"),)
+    __mapper_args__ = dict(version_id_col=_version_column)
     id: Optional[int] = Field(default=None, primary_key=True)
 
-    review_post_id: int = Field(default=None, foreign_key="review_posts.id")
-    review_post: review_posts.DBReviewPost = Relationship()
+    created_at: datetime.datetime = Field(default_factory=datetime.datetime.now)
+    updated_at: datetime.datetime = Field(
+        default_factory=datetime.datetime.now,
+        index=True,
+        sa_column_kwargs=dict(onupdate=datetime.datetime.now),
+    )
+    version: int = Field(default=1, sa_column=_version_column)
+
+    review_post_id: int = Field(
+        default=None, foreign_key="review_posts.id", ondelete="CASCADE"
+    )
+    review_post: review_posts.DBReviewPost = Relationship(back_populates="comments")
 
     user_id: int = Field(default=None, foreign_key="users.id")
     user: users.DBUser | None = Relationship()
 
 
+class ReviewPostWithComments(review_posts.ReviewPost):
+    comments: list[Comment]
+    comments_next_cursor: str | None = None
+
+
 class CommentList(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
     comments: list[Comment]
-    page: int
-    page_count: int
+    page: int | None = None
+    page_count: int | None = None
     size_per_page: int
+    next_cursor: str | None = None
@@ -0,0 +1,33 @@
+import datetime
+
+from pydantic import BaseModel, ConfigDict
+from sqlmodel import SQLModel, Field
+
+
+class BaseCourse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    course_code: str
+    course_name: str
+    review_posts_amount: int = 0
+    likes_amount: int = 0
+    comments_amount: int = 0
+    latest_review_date: datetime.datetime | None = None
+
+
+class Course(BaseCourse):
+    pass
+
+
+class DBCourse(BaseCourse, SQLModel, table=True):
+    __tablename__ = "courses"
+    course_code: str = Field(primary_key=True)
+
+
+class CourseList(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    courses: list[Course]
+    page: int
+    page_count: int
+    size_per_page: int
@@ -1,7 +1,9 @@
+import datetime
 from typing import Optional
 
 from pydantic import BaseModel, ConfigDict
-from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Column, Integer
+from sqlmodel import SQLModel, Field, Relationship, Index
 
 from . import users
 
@@ -28,12 +30,29 @@ class UpdatedEvent(BaseEvent):
 
 class Event(BaseEvent):
     id: int
+    version: int = 1
+    created_at: datetime.datetime | None = None
+    updated_at: datetime.datetime | None = None
+
+
+# bumped on every write, ORM updates only match rows still at the loaded version
+_version_column = Column("version", Integer, nullable=False, default=1)
 
 
 class DBEvent(BaseEvent, SQLModel, table=True):
     __tablename__ = "events"
+    __table_args__ = (Index("ix_events_user_id_id", "user_id", "id"),)
+    __mapper_args__ = dict(version_id_col=_version_column)
     id: Optional[int] = Field(default=None, primary_key=True)
 
+    created_at: datetime.datetime = Field(default_factory=datetime.datetime.now)
+    updated_at: datetime.datetime = Field(
+        default_factory=datetime.datetime.now,
+        index=True,
+        sa_column_kwargs=dict(onupdate=datetime.datetime.now),
+    )
+    version: int = Field(default=1, sa_column=_version_column)
+
     user_id: int = Field(default=None, foreign_key="users.id")
     user: users.DBUser | None = Relationship()
 
@@ -42,6 +61,7 @@ class EventList(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
     events: list[Event]
-    page: int
-    page_count: int
+    page: int | None = None
+    page_count: int | None = None
     size_per_page: int
+    next_cursor: str | None = None
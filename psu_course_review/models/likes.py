@@ -0,0 +1,25 @@
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+from sqlmodel import SQLModel, Field, Index, UniqueConstraint
+
+
+class LikeStatus(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    liked: bool
+    likes_amount: int
+
+
+class DBLike(SQLModel, table=True):
+    __tablename__ = "likes"
+    __table_args__ = (
+        UniqueConstraint("user_id", "target_type", "target_id"),
+        # the likes of a target are deleted along with it
+        Index("ix_likes_target", "target_type", "target_id"),
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    user_id: int = Field(foreign_key="users.id")
+    target_type: str
+    target_id: int
@@ -1,9 +1,20 @@
-from pydantic import BaseModel, ConfigDict
-from sqlmodel import SQLModel, Field, Relationship
-from typing import Optional
+import datetime
+
+from pydantic import BaseModel, ConfigDict, field_validator
+from sqlalchemy import DDL, Column, Integer, event
+from sqlmodel import SQLModel, Field, Relationship, Index
+from typing import Optional, TYPE_CHECKING
 
 from . import users
 
+if TYPE_CHECKING:
+    from .comments import DBComment
+
+
+def normalize_course_code(course_code: str) -> str:
+    # "  240-101 " and "240 - 101" are the same course as "240-101"
+    return "".join(course_code.split()).upper()
+
 
 class BaseReviewPost(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -17,6 +28,11 @@ class BaseReviewPost(BaseModel):
     comments_amount: int = 0
     user_id: int | None = 0
 
+    @field_validator("course_code")
+    @classmethod
+    def validate_course_code(cls, value: str) -> str:
+        return normalize_course_code(value)
+
 
 class CreatedReviewPost(BaseReviewPost):
     pass
@@ -28,20 +44,100 @@ class UpdatedReviewPost(BaseReviewPost):
 
 class ReviewPost(BaseReviewPost):
     id: int
+    version: int = 1
+    created_at: datetime.datetime | None = None
+    updated_at: datetime.datetime | None = None
+
+
+# bumped on every write, ORM updates only match rows still at the loaded version
+_version_column = Column("version", Integer, nullable=False, default=1)
 
 
 class DBReviewPost(BaseReviewPost, SQLModel, table=True):
     __tablename__ = "review_posts"
+    __table_args__ = (
+        Index("ix_review_posts_user_id_id", "user_id", "id"),
+        Index("ix_review_posts_course_code_id", "course_code", "id"),
+    )
+    __mapper_args__ = dict(version_id_col=_version_column)
     id: Optional[int] = Field(default=None, primary_key=True)
 
+    created_at: datetime.datetime = Field(default_factory=datetime.datetime.now)
+    updated_at: datetime.datetime = Field(
+        default_factory=datetime.datetime.now,
+        index=True,
+        sa_column_kwargs=dict(onupdate=datetime.datetime.now),
+    )
+    version: int = Field(default=1, sa_column=_version_column)
+
     user_id: int = Field(default=None, foreign_key="users.id")
     user: users.DBUser | None = Relationship()
 
+    # never loaded on delete, ON DELETE CASCADE removes the comments server side
+    comments: list["DBComment"] = Relationship(
+        back_populates="review_post", passive_deletes=True
+    )
+
 
 class ReviewPostList(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
     review_posts: list[ReviewPost]
-    page: int
-    page_count: int
+    page: int | None = None
+    page_count: int | None = None
     size_per_page: int
+    next_cursor: str | None = None
+
+
+# full-text search index, queried by the backends in search.py
+SEARCH_DOCUMENT = (
+    "to_tsvector('simple', coalesce(course_code, '') || ' ' || "
+    "coalesce(course_name, '') || ' ' || coalesce(review_post_text, ''))"
+)
+
+POSTGRESQL_SEARCH_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_review_posts_search "
+    f"ON review_posts USING GIN ({SEARCH_DOCUMENT})",
+]
+
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS review_posts_fts USING fts5("
+    "course_code, course_name, review_post_text, "
+    "content='review_posts', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS review_posts_fts_insert "
+    "AFTER INSERT ON review_posts BEGIN "
+    "INSERT INTO review_posts_fts(rowid, course_code, course_name, review_post_text) "
+    "VALUES (new.id, new.course_code, new.course_name, new.review_post_text); END",
+    "CREATE TRIGGER IF NOT EXISTS review_posts_fts_delete "
+    "AFTER DELETE ON review_posts BEGIN "
+    "INSERT INTO review_posts_fts(review_posts_fts, rowid, course_code, course_name, "
+    "review_post_text) VALUES "
+    "('delete', old.id, old.course_code, old.course_name, old.review_post_text); END",
+    "CREATE TRIGGER IF NOT EXISTS review_posts_fts_update "
+    "AFTER UPDATE OF course_code, course_name, review_post_text ON review_posts BEGIN "
+    "INSERT INTO review_posts_fts(review_posts_fts, rowid, course_code, course_name, "
+    "review_post_text) VALUES "
+    "('delete', old.id, old.course_code, old.course_name, old.review_post_text); "
+    "INSERT INTO review_posts_fts(rowid, course_code, course_name, review_post_text) "
+    "VALUES (new.id, new.course_code, new.course_name, new.review_post_text); END",
+]
+
+for statement in POSTGRESQL_SEARCH_DDL:
+    event.listen(
+        DBReviewPost.__table__,
+        "after_create",
+        DDL(statement).execute_if(dialect="postgresql"),
+    )
+
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(
+        DBReviewPost.__table__,
+        "after_create",
+        DDL(statement).execute_if(dialect="sqlite"),
+    )
+
+event.listen(
+    DBReviewPost.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS review_posts_fts").execute_if(dialect="sqlite"),
+)
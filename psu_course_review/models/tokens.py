@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from sqlmodel import SQLModel, Field
+
+
+class RefreshToken(BaseModel):
+    refresh_token: str
+
+
+class DBRevokedToken(SQLModel, table=True):
+    __tablename__ = "revoked_tokens"
+    jti: str = Field(primary_key=True)
+
+    # the token's exp as a unix timestamp, the entry is useless after it
+    expires_at: int = Field(index=True)
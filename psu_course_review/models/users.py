@@ -8,7 +8,7 @@ from sqlmodel import SQLModel, Field, Column, JSON
 # from passlib.context import CryptContext
 
 # pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-import bcrypt
+from .. import passwords
 
 
 class BaseUser(BaseModel):
@@ -29,6 +29,11 @@ class User(BaseUser):
     )
 
 
+class AuthenticatedUser(User):
+    roles: list[str] = ["user"]
+    status: str = "active"
+
+
 class ReferenceUser(BaseModel):
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
     username: str
@@ -74,6 +79,18 @@ class Token(BaseModel):
     user_id: int
 
 
+class TokenClaims(BaseModel):
+    sub: int
+    exp: int
+    jti: str | None = None
+    # shared by every token rotated from one login, revoked together
+    fam: str | None = None
+    type: str = "access"
+    # tokens issued before roles were added to the claims act as plain users
+    roles: list[str] = ["user"]
+    status: str = "active"
+
+
 class ChangedPasswordUser(BaseModel):
     current_password: str
     new_password: str
@@ -83,6 +100,10 @@ class DBUser(BaseUser, SQLModel, table=True):
     __tablename__ = "users"
     id: int | None = Field(default=None, primary_key=True)
 
+    # /token looks users up by either, the unique indexes also reject duplicates
+    email: str = Field(index=True, unique=True)
+    username: str = Field(index=True, unique=True)
+
     password: str
 
     register_date: datetime.datetime = Field(default_factory=datetime.datetime.now)
@@ -90,6 +111,9 @@ class DBUser(BaseUser, SQLModel, table=True):
     last_login_date: datetime.datetime | None = Field(default=None)
     roles: List[str] = Field(sa_column=Column(JSON), default=["user"])
 
+    review_posts_amount: int = Field(default=0)
+    events_amount: int = Field(default=0)
+
     async def has_roles(self, roles):
         for role in roles:
             if role in self.roles:
@@ -97,14 +121,13 @@ class DBUser(BaseUser, SQLModel, table=True):
         return False
 
     async def get_encrypted_password(self, plain_password):
-        return bcrypt.hashpw(
-            plain_password.encode("utf-8"), salt=bcrypt.gensalt()
-        ).decode("utf-8")
+        return await passwords.hasher.hash(plain_password)
 
     async def set_password(self, plain_password):
         self.password = await self.get_encrypted_password(plain_password)
 
     async def verify_password(self, plain_password):
-        return bcrypt.checkpw(
-            plain_password.encode("utf-8"), self.password.encode("utf-8")
-        )
+        return await passwords.hasher.verify(plain_password, self.password)
+
+    def password_needs_rehash(self):
+        return passwords.hasher.needs_rehash(self.password)
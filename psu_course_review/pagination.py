@@ -0,0 +1,68 @@
+import base64
+import binascii
+import json
+import math
+
+from fastapi import HTTPException, status
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+MAX_SIZE_PER_PAGE = 100
+
+
+def encode_cursor(**keys) -> str:
+    raw = json.dumps(keys, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        keys = json.loads(raw)
+    except (binascii.Error, ValueError):
+        keys = None
+
+    if not isinstance(keys, dict):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+    return keys
+
+
+def count_pages(total: int, size_per_page: int) -> int:
+    return int(math.ceil(total / size_per_page))
+
+
+async def paginate(
+    session: AsyncSession,
+    query,
+    model,
+    page: int = 1,
+    after: str | None = None,
+    limit: int = 50,
+) -> tuple[list, str | None]:
+    # ids are assigned in creation order, so (created order, id) collapses to id
+    query = query.order_by(model.id)
+
+    if after is not None:
+        last_id = decode_cursor(after).get("id")
+        if not isinstance(last_id, int):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+            )
+        query = query.where(model.id > last_id)
+    else:
+        query = query.offset((page - 1) * limit)
+
+    # fetch one extra row to know whether another page exists
+    result = await session.exec(query.limit(limit + 1))
+    items = result.all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(id=items[-1].id)
+
+    return items, next_cursor
@@ -0,0 +1,120 @@
+import asyncio
+import concurrent.futures
+import math
+import time
+
+import bcrypt
+from fastapi import HTTPException, status
+
+from . import config
+
+
+settings = config.get_settings()
+
+
+def _hash_password(plain_password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(plain_password, bcrypt.gensalt(rounds=rounds))
+
+
+def _check_password(plain_password: bytes, hashed_password: bytes) -> bool:
+    return bcrypt.checkpw(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        executor: str = "thread",
+        max_workers: int = 4,
+        rounds: int = 12,
+        max_queue: int = 32,
+    ):
+        self.executor = executor
+        self.max_workers = max_workers
+        self.rounds = rounds
+        self.max_queue = max_queue
+
+        # moving average of one call, to tell shed callers when to come back
+        self.average_seconds = 0.25
+
+        # calls waiting for a free worker, exposed as a saturation metric
+        self.queue_depth = 0
+        self.in_flight = 0
+
+        self._executor: concurrent.futures.Executor | None = None
+        self._semaphore = asyncio.Semaphore(max_workers)
+
+    def _get_executor(self) -> concurrent.futures.Executor:
+        if self._executor is None:
+            if self.executor == "process":
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.max_workers
+                )
+            else:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="password"
+                )
+        return self._executor
+
+    def _overloaded(self) -> HTTPException:
+        batches = (self.queue_depth + self.in_flight) / self.max_workers
+        retry_after = max(1, math.ceil(batches * self.average_seconds))
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Server is busy, try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    async def _run(self, func, *args):
+        # shed instead of queueing without bound, a long queue only adds latency
+        if self._semaphore.locked() and self.queue_depth >= self.max_queue:
+            raise self._overloaded()
+
+        self.queue_depth += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queue_depth -= 1
+
+        self.in_flight += 1
+        started_at = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            elapsed = time.monotonic() - started_at
+            self.average_seconds += (elapsed - self.average_seconds) * 0.1
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def hash(self, plain_password: str) -> str:
+        hashed_password = await self._run(
+            _hash_password, plain_password.encode("utf-8"), self.rounds
+        )
+        return hashed_password.decode("utf-8")
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(
+            _check_password,
+            plain_password.encode("utf-8"),
+            hashed_password.encode("utf-8"),
+        )
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        # bcrypt hashes look like $2b$<rounds>$<salt+hash>
+        try:
+            return int(hashed_password.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+hasher = PasswordHasher(
+    executor=settings.PASSWORD_HASH_EXECUTOR,
+    max_workers=settings.PASSWORD_HASH_MAX_WORKERS,
+    rounds=settings.BCRYPT_ROUNDS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
@@ -0,0 +1,133 @@
+import importlib
+import math
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+from fastapi import HTTPException, Request, status
+
+from . import config
+
+
+settings = config.get_settings()
+
+
+class RateLimitBackend:
+    def __init__(
+        self,
+        namespace: str = "",
+        rate: float = 1,
+        capacity: int = 10,
+        max_size: int = 10_000,
+    ):
+        # a token bucket per key, refilled at rate tokens per second up to capacity
+        self.namespace = namespace
+        self.rate = rate
+        self.capacity = capacity
+        self.max_size = max_size
+
+    async def take(self, key: Hashable) -> float:
+        # 0 when a token was taken, otherwise the seconds until one is available
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+
+class MemoryRateLimiter(RateLimitBackend):
+    def __init__(
+        self,
+        namespace: str = "",
+        rate: float = 1,
+        capacity: int = 10,
+        max_size: int = 10_000,
+    ):
+        super().__init__(
+            namespace=namespace, rate=rate, capacity=capacity, max_size=max_size
+        )
+        self._buckets: OrderedDict[Hashable, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: Hashable) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated_at) * self.rate)
+
+        if tokens >= 1:
+            tokens -= 1
+            retry_after = 0.0
+        else:
+            retry_after = (1 - tokens) / self.rate
+
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+
+        # the least recently seen keys go first, they have refilled the longest
+        while len(self._buckets) > self.max_size:
+            self._buckets.popitem(last=False)
+
+        return retry_after
+
+    async def clear(self):
+        self._buckets.clear()
+
+
+def create_limiter(
+    backend: str,
+    namespace: str,
+    rate: float,
+    capacity: int,
+    max_size: int = 10_000,
+) -> RateLimitBackend:
+    # "memory" or a "package.module:ClassName" RateLimitBackend for a shared store
+    if backend == "memory":
+        return MemoryRateLimiter(
+            namespace=namespace, rate=rate, capacity=capacity, max_size=max_size
+        )
+
+    module_name, _, class_name = backend.partition(":")
+    limiter_class = getattr(importlib.import_module(module_name), class_name)
+    return limiter_class(
+        namespace=namespace, rate=rate, capacity=capacity, max_size=max_size
+    )
+
+
+ip_limiter = create_limiter(
+    settings.RATE_LIMIT_BACKEND,
+    "ip",
+    rate=settings.RATE_LIMIT_IP_PER_MINUTE / 60,
+    capacity=settings.RATE_LIMIT_IP_BURST,
+    max_size=settings.RATE_LIMIT_MAX_KEYS,
+)
+username_limiter = create_limiter(
+    settings.RATE_LIMIT_BACKEND,
+    "username",
+    rate=settings.RATE_LIMIT_USERNAME_PER_MINUTE / 60,
+    capacity=settings.RATE_LIMIT_USERNAME_BURST,
+    max_size=settings.RATE_LIMIT_MAX_KEYS,
+)
+
+
+def too_many_requests(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many requests",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+async def check(request: Request, username: str | None = None):
+    # runs before any password work, so a rejected attempt costs no bcrypt round
+    client = request.client.host if request.client else "unknown"
+    retry_after = await ip_limiter.take(client)
+    if retry_after:
+        raise too_many_requests(retry_after)
+
+    if username:
+        retry_after = await username_limiter.take(username.strip().lower())
+        if retry_after:
+            raise too_many_requests(retry_after)
+
+
+async def clear():
+    await ip_limiter.clear()
+    await username_limiter.clear()
@@ -0,0 +1,168 @@
+import heapq
+import importlib
+import time
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select, delete
+
+from . import caches
+from . import config
+from . import models
+
+
+settings = config.get_settings()
+
+
+class RevocationStore:
+    async def add(self, jti: str, expires_at: int) -> bool:
+        # False when the jti was already revoked, by this or another worker
+        raise NotImplementedError
+
+    async def contains(self, jti: str) -> bool:
+        raise NotImplementedError
+
+    async def prune(self):
+        raise NotImplementedError
+
+    async def load(self) -> dict[str, int]:
+        raise NotImplementedError
+
+
+class MemoryRevocationStore(RevocationStore):
+    # nothing outlives the process, revoked tokens work again after a restart
+    async def add(self, jti: str, expires_at: int) -> bool:
+        return True
+
+    async def contains(self, jti: str) -> bool:
+        return False
+
+    async def prune(self):
+        pass
+
+    async def load(self) -> dict[str, int]:
+        return {}
+
+
+class DatabaseRevocationStore(RevocationStore):
+    async def add(self, jti: str, expires_at: int) -> bool:
+        async with models.session_factory() as session:
+            session.add(models.DBRevokedToken(jti=jti, expires_at=expires_at))
+            try:
+                await session.commit()
+            except IntegrityError:
+                # the primary key decides between concurrent workers
+                await session.rollback()
+                return False
+        return True
+
+    async def contains(self, jti: str) -> bool:
+        async with models.session_factory() as session:
+            return await session.get(models.DBRevokedToken, jti) is not None
+
+    async def prune(self):
+        now = int(time.time())
+        async with models.session_factory() as session:
+            await session.exec(
+                delete(models.DBRevokedToken).where(
+                    models.DBRevokedToken.expires_at <= now
+                )
+            )
+            await session.commit()
+
+    async def load(self) -> dict[str, int]:
+        await self.prune()
+        async with models.session_factory() as session:
+            result = await session.exec(select(models.DBRevokedToken))
+            return {token.jti: token.expires_at for token in result.all()}
+
+
+class RevocationList:
+    def __init__(
+        self,
+        store: RevocationStore,
+        checks: caches.CacheBackend,
+        prune_interval: float = 60 * 60,
+    ):
+        self.store = store
+        # jtis the store recently reported as not revoked
+        self.checks = checks
+        self.prune_interval = prune_interval
+        self._pruned_at = time.monotonic()
+        self._revoked: dict[str, int] = {}
+        # (expires_at, jti), so expired entries are dropped without a scan
+        self._expiry: list[tuple[int, str]] = []
+
+    def _prune(self):
+        now = time.time()
+        while self._expiry and self._expiry[0][0] <= now:
+            _, jti = heapq.heappop(self._expiry)
+            self._revoked.pop(jti, None)
+
+    def _add(self, jti: str, expires_at: int) -> bool:
+        if jti in self._revoked:
+            return False
+        self._revoked[jti] = expires_at
+        heapq.heappush(self._expiry, (expires_at, jti))
+        return True
+
+    def is_revoked(self, jti: str | None) -> bool:
+        self._prune()
+        return jti is not None and jti in self._revoked
+
+    async def is_revoked_anywhere(self, jti: str | None, expires_at: int) -> bool:
+        # also asks the store, for tokens revoked by another worker, a token
+        # found there is kept until expires_at and a miss for the checks' ttl
+        if jti is None:
+            return False
+        if self.is_revoked(jti):
+            return True
+        if await self.checks.get(jti) is not None:
+            return False
+
+        if await self.store.contains(jti):
+            self._add(jti, expires_at)
+            return True
+
+        await self.checks.set(jti, True)
+        return False
+
+    async def revoke(self, jti: str, expires_at: int) -> bool:
+        # True only for the one call that revoked the jti: the local mark is
+        # set before the first await, the store decides between workers
+        self._prune()
+        added = self._add(jti, expires_at)
+        await self.checks.delete(jti)
+        added = await self.store.add(jti, expires_at) and added
+
+        if time.monotonic() - self._pruned_at >= self.prune_interval:
+            self._pruned_at = time.monotonic()
+            await self.store.prune()
+
+        return added
+
+    async def load(self):
+        for jti, expires_at in (await self.store.load()).items():
+            self._add(jti, expires_at)
+        self._prune()
+
+
+def create_store(backend: str) -> RevocationStore:
+    if backend == "memory":
+        return MemoryRevocationStore()
+    if backend == "database":
+        return DatabaseRevocationStore()
+
+    module_name, _, class_name = backend.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+revoked_tokens = RevocationList(
+    create_store(settings.REVOCATION_STORE),
+    caches.create_cache(
+        settings.CACHE_BACKEND,
+        "revocation_checks",
+        max_size=settings.TOKEN_CACHE_MAX_SIZE,
+        ttl=settings.REVOCATION_CHECK_TTL_SECONDS,
+    ),
+    prune_interval=settings.REVOCATION_PRUNE_INTERVAL_SECONDS,
+)
@@ -1,10 +1,13 @@
 from . import authentication
 from . import comments
+from . import courses
 
 from . import review_posts
 from . import root
 from . import users
 from . import events
+from . import sync
+from . import export
 
 
 def init_router(app):
@@ -14,3 +17,6 @@ def init_router(app):
     app.include_router(review_posts.router)
     app.include_router(comments.router)
     app.include_router(events.router)
+    app.include_router(courses.router)
+    app.include_router(sync.router)
+    app.include_router(export.router)
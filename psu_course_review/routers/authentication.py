@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Security, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Security, status
 from fastapi.security import (
     HTTPAuthorizationCredentials,
     HTTPBasicCredentials,
@@ -7,12 +7,19 @@ from fastapi.security import (
 )
 
 
-from sqlmodel import select
+from pydantic import ValidationError
+from sqlmodel import select, or_
 from typing import Annotated
 import datetime
+import time
+import uuid
+import jwt
 
 from .. import config
+from .. import deps
 from .. import models
+from .. import ratelimit
+from .. import revocation
 from .. import security
 
 router = APIRouter(tags=["authentication"])
@@ -24,21 +31,22 @@ settings = config.get_settings()
     "/token",
 )
 async def authentication(
+    request: Request,
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     session: Annotated[models.AsyncSession, Depends(models.get_session)],
 ) -> models.Token:
+    await ratelimit.check(request, form_data.username)
 
+    # one index-backed lookup, a username match wins over another user's email
+    is_username = models.DBUser.username == form_data.username
     result = await session.exec(
-        select(models.DBUser).where(models.DBUser.username == form_data.username)
+        select(models.DBUser)
+        .where(or_(is_username, models.DBUser.email == form_data.username))
+        .order_by(is_username.desc())
+        .limit(1)
     )
 
-    user = result.one_or_none()
-
-    if not user:
-        result = await session.exec(
-            select(models.DBUser).where(models.DBUser.email == form_data.username)
-        )
-        user = result.one_or_none()
+    user = result.first()
 
     if not user:
         raise HTTPException(
@@ -52,29 +60,135 @@ async def authentication(
             detail="Incorrect username or password",
         )
 
+    if user.password_needs_rehash():
+        await user.set_password(form_data.password)
+
     user.last_login_date = datetime.datetime.now()
 
     session.add(user)
     await session.commit()
-    await session.refresh(user)
 
+    await deps.invalidate_user(user.id)
+
+    return issue_tokens(user, user.last_login_date)
+
+
+@router.post("/token/refresh")
+async def refresh(
+    refresh_token: models.RefreshToken,
+    session: Annotated[models.AsyncSession, Depends(models.get_session)],
+) -> models.Token:
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        claims = models.TokenClaims.model_validate(
+            jwt.decode(
+                refresh_token.refresh_token,
+                settings.SECRET_KEY,
+                algorithms=[security.ALGORITHM],
+            )
+        )
+    except (jwt.PyJWTError, ValidationError):
+        raise credentials_exception
+
+    if claims.type != "refresh" or claims.jti is None:
+        raise credentials_exception
+
+    if await revocation.revoked_tokens.is_revoked_anywhere(claims.fam, claims.exp):
+        raise credentials_exception
+
+    # rotation, each refresh token is exchanged at most once, concurrent
+    # requests with the same token included
+    if not await revocation.revoked_tokens.revoke(claims.jti, claims.exp):
+        # a replayed token may have been stolen, end every token of its login
+        if claims.fam is not None:
+            await revoke_family(claims.fam)
+        raise credentials_exception
+
+    user = await session.get(models.DBUser, claims.sub)
+    if user is None:
+        raise credentials_exception
+
+    return issue_tokens(user, datetime.datetime.now(), family=claims.fam)
+
+
+@router.post("/logout")
+async def logout(
+    token: Annotated[str, Depends(deps.oauth2_scheme)],
+    claims: Annotated[models.TokenClaims, Depends(deps.get_current_claims)],
+    refresh_token: models.RefreshToken | None = None,
+) -> dict:
+    if claims.jti is not None:
+        await revocation.revoked_tokens.revoke(claims.jti, claims.exp)
+
+    # ends the whole login, the refresh token included even when not sent
+    if claims.fam is not None:
+        await revoke_family(claims.fam)
+
+    if refresh_token is not None:
+        try:
+            refresh_claims = models.TokenClaims.model_validate(
+                jwt.decode(
+                    refresh_token.refresh_token,
+                    settings.SECRET_KEY,
+                    algorithms=[security.ALGORITHM],
+                )
+            )
+        except (jwt.PyJWTError, ValidationError):
+            refresh_claims = None
+
+        if (
+            refresh_claims is not None
+            and refresh_claims.sub == claims.sub
+            and refresh_claims.jti is not None
+        ):
+            await revocation.revoked_tokens.revoke(
+                refresh_claims.jti, refresh_claims.exp
+            )
+
+    return dict(message="Logged out")
+
+
+async def revoke_family(family: str):
+    # the family outlives any one token, its latest refresh token expires last
+    await revocation.revoked_tokens.revoke(
+        family, int(time.time()) + settings.REFRESH_TOKEN_EXPIRE_MINUTES * 60
+    )
+
+
+def issue_tokens(
+    user: models.DBUser, issued_at: datetime.datetime, family: str | None = None
+) -> models.Token:
     access_token_expires = datetime.timedelta(
         minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
     )
 
+    # lets role and status checks skip loading the user on every request
+    authenticated_user = models.AuthenticatedUser.model_validate(user)
+
+    # a login starts a family, a refresh carries it on
+    family = family or uuid.uuid4().hex
+
     return models.Token(
         access_token=security.create_access_token(
-            data={"sub": user.id},
+            data={
+                "sub": user.id,
+                "roles": authenticated_user.roles,
+                "status": authenticated_user.status,
+                "fam": family,
+            },
             expires_delta=access_token_expires,
         ),
         refresh_token=security.create_refresh_token(
-            data={"sub": user.id},
-            expires_delta=access_token_expires,
+            data={"sub": user.id, "fam": family}
         ),
         token_type="Bearer",
         scope="",
         expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES,
         expires_at=datetime.datetime.now() + access_token_expires,
-        issued_at=user.last_login_date,
+        issued_at=issued_at,
         user_id=user.id,
     )
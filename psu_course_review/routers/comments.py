@@ -1,14 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 
 from typing import Annotated
 
-from sqlmodel import select, func
+from sqlalchemy.orm.exc import StaleDataError
+from sqlmodel import delete, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-import math
-
 from .. import models
+from .. import batch
+from .. import changes
 from .. import deps
+from .. import likes
+from .. import counters
+from .. import courses
+from .. import pagination
+from .. import http_cache
 
 router = APIRouter(prefix="/comments", tags=["comments"])
 
@@ -22,103 +28,144 @@ async def create_comment(
     current_user: Annotated[models.User, Depends(deps.get_current_user)],
     session: Annotated[AsyncSession, Depends(models.get_session)],
 ) -> models.Comment:
-    db_review_post = await session.get(models.DBReviewPost, comment.review_post_id)
-    if db_review_post is None:
+    updated = await counters.increment(
+        session, models.DBReviewPost, comment.review_post_id, "comments_amount", 1
+    )
+    if not updated:
         raise HTTPException(status_code=404, detail="Review post not found")
 
-    db_review_post.comments_amount += 1
-
-    session.add(db_review_post)
+    await courses.increment_for_review_post(
+        session, comment.review_post_id, "comments_amount", 1
+    )
 
     db_comment = models.DBComment.model_validate(comment)
 
     db_comment.comment_author = current_user.first_name + " " + current_user.last_name
 
-    db_comment.review_post = db_review_post
-    db_comment.user = current_user
+    db_comment.user_id = current_user.id
 
     session.add(db_comment)
+    await session.flush()
+    changes.record(session, models.DBComment, db_comment.id)
+
     await session.commit()
-    await session.refresh(db_comment)
+
+    await counters.row_counts.adjust(models.DBComment, db_comment, 1)
+    await http_cache.invalidate("comments", "review_posts", "courses")
 
     return models.Comment.model_validate(db_comment)
 
 
 @router.get("")
 async def read_comments(
+    request: Request,
     session: Annotated[AsyncSession, Depends(models.get_session)],
     page: int = 1,
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=pagination.MAX_SIZE_PER_PAGE)] = SIZE_PER_PAGE,
+    include_total: bool = True,
 ) -> models.CommentList:
-    query = (
-        select(models.DBComment).offset((page - 1) * SIZE_PER_PAGE).limit(SIZE_PER_PAGE)
+    cache_key, cached_response = await http_cache.get_list_response(request, "comments")
+    if cached_response is not None:
+        return cached_response
+
+    comments, next_cursor = await pagination.paginate(
+        session,
+        select(models.DBComment),
+        models.DBComment,
+        page=page,
+        after=after,
+        limit=limit,
     )
-    result = await session.exec(query)
-    comments = result.all()
 
-    page_count = int(
-        math.ceil(
-            (await session.exec(select(func.count(models.DBComment.id)))).first()
-            / SIZE_PER_PAGE
+    page_count = None
+    if include_total:
+        page_count = pagination.count_pages(
+            await counters.row_counts.get(session, models.DBComment), limit
         )
-    )
 
-    return models.CommentList.model_validate(
+    comment_list = models.CommentList.model_validate(
         dict(
             comments=comments,
             page_count=page_count,
-            page=page,
-            size_per_page=SIZE_PER_PAGE,
+            page=page if after is None else None,
+            size_per_page=limit,
+            next_cursor=next_cursor,
         )
     )
+    return await http_cache.list_response(request, cache_key, comment_list)
 
 
 @router.get("/review_post/{review_post_id}")
 async def read_comments_list_by_review_post_id(
     review_post_id: int,
+    request: Request,
     session: Annotated[AsyncSession, Depends(models.get_session)],
     page: int = 1,
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=pagination.MAX_SIZE_PER_PAGE)] = SIZE_PER_PAGE,
+    include_total: bool = True,
 ) -> models.CommentList:
-    query = (
-        select(models.DBComment)
-        .where(models.DBComment.review_post_id == review_post_id)
-        .offset((page - 1) * SIZE_PER_PAGE)
-        .limit(SIZE_PER_PAGE)
+    cache_key, cached_response = await http_cache.get_list_response(request, "comments")
+    if cached_response is not None:
+        return cached_response
+
+    comments, next_cursor = await pagination.paginate(
+        session,
+        select(models.DBComment).where(
+            models.DBComment.review_post_id == review_post_id
+        ),
+        models.DBComment,
+        page=page,
+        after=after,
+        limit=limit,
     )
-    result = await session.exec(query)
-    comments = result.all()
-
-    page_count = int(
-        math.ceil(
-            (
-                await session.exec(
-                    select(func.count(models.DBComment.id)).where(
-                        models.DBComment.review_post_id == review_post_id
-                    )
-                )
-            ).first()
-            / SIZE_PER_PAGE
+
+    page_count = None
+    if include_total:
+        page_count = pagination.count_pages(
+            await counters.row_counts.get(
+                session, models.DBComment, review_post_id=review_post_id
+            ),
+            limit,
         )
-    )
 
-    return models.CommentList.model_validate(
+    comment_list = models.CommentList.model_validate(
         dict(
             comments=comments,
             page_count=page_count,
-            page=page,
-            size_per_page=SIZE_PER_PAGE,
+            page=page if after is None else None,
+            size_per_page=limit,
+            next_cursor=next_cursor,
         )
     )
+    return await http_cache.list_response(request, cache_key, comment_list)
+
+
+@router.get("/batch")
+async def read_comments_batch(
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    ids: Annotated[str, Query(description="Comma separated comment ids")],
+) -> list[models.Comment]:
+    return await batch.read_by_ids(session, models.DBComment, ids)
 
 
 @router.get("/{comment_id}")
 async def read_comment(
     comment_id: int,
+    request: Request,
+    response: Response,
     session: Annotated[AsyncSession, Depends(models.get_session)],
 ) -> models.Comment:
     db_comment = await session.get(models.DBComment, comment_id)
     if db_comment is None:
         raise HTTPException(status_code=404, detail="Comment not found")
 
+    etag = http_cache.row_etag(db_comment)
+    if http_cache.is_not_modified(request, etag):
+        return http_cache.not_modified_response(etag)
+    response.headers.update(http_cache.cache_headers(etag))
+
     return models.Comment.model_validate(db_comment)
 
 
@@ -126,8 +173,10 @@ async def read_comment(
 async def update_comment(
     comment_id: int,
     comment: models.UpdatedComment,
+    response: Response,
     current_user: Annotated[models.User, Depends(deps.get_current_user)],
     session: Annotated[AsyncSession, Depends(models.get_session)],
+    if_match: Annotated[str | None, Header()] = None,
 ) -> models.Comment:
     db_comment = await session.get(models.DBComment, comment_id)
     if db_comment is None:
@@ -138,17 +187,33 @@ async def update_comment(
             status_code=403, detail="Forbidden, you are not the author of this comment"
         )
 
+    http_cache.check_if_match(if_match, http_cache.row_etag(db_comment))
+
     comment.comment_author = db_comment.comment_author
     comment.review_post_id = db_comment.review_post_id
     comment.user_id = db_comment.user_id
 
-    data = comment.model_dump()
+    likes_delta = comment.likes_amount - db_comment.likes_amount
+    data = comment.model_dump(exclude={"likes_amount"})
 
     db_comment.sqlmodel_update(data)
 
     session.add(db_comment)
+    try:
+        # the UPDATE only matches the version loaded above
+        await session.flush()
+    except StaleDataError:
+        raise http_cache.precondition_failed()
+
+    changes.record(session, models.DBComment, comment_id)
+    if likes_delta:
+        await counters.increment(
+            session, models.DBComment, comment_id, "likes_amount", likes_delta
+        )
     await session.commit()
-    await session.refresh(db_comment)
+
+    await http_cache.invalidate("comments")
+    response.headers["ETag"] = http_cache.row_etag(db_comment)
 
     return models.Comment.model_validate(db_comment)
 
@@ -168,13 +233,56 @@ async def delete_comment(
             status_code=403, detail="Forbidden, you are not the author of this comment"
         )
 
-    db_review_post = await session.get(models.DBReviewPost, db_comment.review_post_id)
-    db_review_post.comments_amount -= 1
-
-    session.add(db_review_post)
-
-    await session.delete(db_comment)
+    # by id, a like flushed since the load bumps the version but must not
+    # fail the delete
+    await session.exec(
+        delete(models.DBComment)
+        .where(models.DBComment.id == comment_id)
+        .execution_options(synchronize_session=False)
+    )
+    changes.record(session, models.DBComment, comment_id, deleted=True)
+    await likes.delete_likes(session, "comment", comment_id)
+    await counters.increment(
+        session, models.DBReviewPost, db_comment.review_post_id, "comments_amount", -1
+    )
+    await courses.increment_for_review_post(
+        session, db_comment.review_post_id, "comments_amount", -1
+    )
     await session.commit()
-    await session.refresh(db_review_post)
+
+    await counters.row_counts.adjust(models.DBComment, db_comment, -1)
+    await http_cache.invalidate("comments", "review_posts", "courses")
 
     return dict(message="Comment deleted")
+
+
+@router.post("/{comment_id}/like")
+async def like_comment(
+    comment_id: int,
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    current_user: Annotated[models.User, Depends(deps.get_current_user)],
+) -> models.LikeStatus:
+    return await likes.like(
+        session,
+        models.DBComment,
+        "comment",
+        comment_id,
+        current_user.id,
+        not_found_detail="Comment not found",
+    )
+
+
+@router.delete("/{comment_id}/like")
+async def unlike_comment(
+    comment_id: int,
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    current_user: Annotated[models.User, Depends(deps.get_current_user)],
+) -> models.LikeStatus:
+    return await likes.unlike(
+        session,
+        models.DBComment,
+        "comment",
+        comment_id,
+        current_user.id,
+        not_found_detail="Comment not found",
+    )
@@ -0,0 +1,95 @@
+from fastapi import APIRouter, Depends, Query, Request
+
+from typing import Annotated, Literal
+
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .. import models
+from .. import pagination
+from .. import http_cache
+from . import review_posts
+
+router = APIRouter(prefix="/courses", tags=["courses"])
+
+
+SIZE_PER_PAGE = 50
+
+SORTS = dict(
+    popularity=(
+        models.DBCourse.review_posts_amount
+        + models.DBCourse.likes_amount
+        + models.DBCourse.comments_amount
+    ).desc(),
+    reviews=models.DBCourse.review_posts_amount.desc(),
+    likes=models.DBCourse.likes_amount.desc(),
+    comments=models.DBCourse.comments_amount.desc(),
+    latest=models.DBCourse.latest_review_date.desc(),
+    course_code=models.DBCourse.course_code,
+)
+
+
+@router.get("")
+async def read_courses(
+    request: Request,
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    sort: Literal[
+        "popularity", "reviews", "likes", "comments", "latest", "course_code"
+    ] = "popularity",
+    page: int = 1,
+    limit: Annotated[int, Query(ge=1, le=pagination.MAX_SIZE_PER_PAGE)] = SIZE_PER_PAGE,
+) -> models.CourseList:
+    cache_key, cached_response = await http_cache.get_list_response(request, "courses")
+    if cached_response is not None:
+        return cached_response
+
+    reviewed = models.DBCourse.review_posts_amount > 0
+
+    query = (
+        select(models.DBCourse)
+        .where(reviewed)
+        .order_by(SORTS[sort], models.DBCourse.course_code)
+        .offset((page - 1) * limit)
+        .limit(limit)
+    )
+    result = await session.exec(query)
+    courses = result.all()
+
+    total = (
+        await session.exec(
+            select(func.count(models.DBCourse.course_code)).where(reviewed)
+        )
+    ).first()
+
+    course_list = models.CourseList.model_validate(
+        dict(
+            courses=courses,
+            page_count=pagination.count_pages(total, limit),
+            page=page,
+            size_per_page=limit,
+        )
+    )
+    return await http_cache.list_response(request, cache_key, course_list)
+
+
+@router.get("/{course_code}/review_posts")
+async def read_course_review_posts(
+    course_code: str,
+    request: Request,
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    page: int = 1,
+    after: str | None = None,
+    limit: Annotated[
+        int, Query(ge=1, le=pagination.MAX_SIZE_PER_PAGE)
+    ] = review_posts.SIZE_PER_PAGE,
+    include_total: bool = True,
+) -> models.ReviewPostList:
+    return await review_posts.read_review_posts(
+        request,
+        session,
+        page=page,
+        after=after,
+        limit=limit,
+        include_total=include_total,
+        course_code=course_code,
+    )
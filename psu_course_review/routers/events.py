@@ -1,14 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 
 from typing import Annotated
 
-from sqlmodel import select, func
+from sqlalchemy import insert
+from sqlalchemy.orm.exc import StaleDataError
+from sqlmodel import delete, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-import math
-
 from .. import models
+from .. import batch
+from .. import bulk
+from .. import changes
 from .. import deps
+from .. import likes
+from .. import counters
+from .. import pagination
+from .. import http_cache
 
 router = APIRouter(prefix="/events", tags=["events"])
 
@@ -24,41 +31,115 @@ async def create_event(
     db_event = models.DBEvent.model_validate(event)
 
     db_event.author_name = current_user.first_name + " " + current_user.last_name
-    db_event.user = current_user
+    db_event.user_id = current_user.id
 
     session.add(db_event)
+    await session.flush()
+    changes.record(session, models.DBEvent, db_event.id)
+
+    await counters.increment(
+        session, models.DBUser, current_user.id, "events_amount", 1
+    )
     await session.commit()
-    await session.refresh(db_event)
+
+    await counters.row_counts.adjust(models.DBEvent, db_event, 1)
+    await http_cache.invalidate("events")
 
     return models.Event.model_validate(db_event)
 
 
+@router.post(
+    "/bulk",
+    openapi_extra=dict(
+        requestBody=dict(
+            content={
+                "application/json": dict(
+                    schema=dict(
+                        type="array",
+                        items={"$ref": "#/components/schemas/CreatedEvent"},
+                    )
+                ),
+                "application/x-ndjson": dict(schema=dict(type="string")),
+            }
+        )
+    ),
+)
+async def create_events_bulk(
+    request: Request,
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    current_user: Annotated[models.User, Depends(deps.get_current_user)],
+) -> models.BulkResult:
+    author_name = current_user.first_name + " " + current_user.last_name
+
+    async def insert_events(events: list) -> list[int]:
+        result = await session.exec(
+            insert(models.DBEvent).returning(
+                models.DBEvent.id, sort_by_parameter_order=True
+            ),
+            params=[
+                models.DBEvent.model_validate(
+                    event, update=dict(author_name=author_name, user_id=current_user.id)
+                ).model_dump(exclude={"id"})
+                for event in events
+            ],
+        )
+        ids = result.scalars().all()
+
+        changes.record_many(session, models.DBEvent, ids)
+        await counters.increment(
+            session, models.DBUser, current_user.id, "events_amount", len(ids)
+        )
+        return ids
+
+    result = await bulk.create_many(
+        session, request, models.CreatedEvent, insert_events
+    )
+
+    if result.created_ids:
+        await counters.row_counts.invalidate(models.DBEvent)
+        await http_cache.invalidate("events")
+
+    return result
+
+
 @router.get("")
 async def read_events(
+    request: Request,
     session: Annotated[AsyncSession, Depends(models.get_session)],
     page: int = 1,
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=pagination.MAX_SIZE_PER_PAGE)] = SIZE_PER_PAGE,
+    include_total: bool = True,
 ) -> models.EventList:
-    query = (
-        select(models.DBEvent).offset((page - 1) * SIZE_PER_PAGE).limit(SIZE_PER_PAGE)
+    cache_key, cached_response = await http_cache.get_list_response(request, "events")
+    if cached_response is not None:
+        return cached_response
+
+    events, next_cursor = await pagination.paginate(
+        session,
+        select(models.DBEvent),
+        models.DBEvent,
+        page=page,
+        after=after,
+        limit=limit,
     )
-    result = await session.exec(query)
-    events = result.all()
 
-    page_count = int(
-        math.ceil(
-            (await session.exec(select(func.count(models.DBEvent.id)))).first()
-            / SIZE_PER_PAGE
+    page_count = None
+    if include_total:
+        page_count = pagination.count_pages(
+            await counters.row_counts.get(session, models.DBEvent), limit
         )
-    )
 
-    return models.EventList.model_validate(
+    event_list = models.EventList.model_validate(
         dict(
             events=events,
             page_count=page_count,
-            page=page,
-            size_per_page=SIZE_PER_PAGE,
+            page=page if after is None else None,
+            size_per_page=limit,
+            next_cursor=next_cursor,
         )
     )
+    return await http_cache.list_response(request, cache_key, event_list)
 
 
 @router.get("/my")
@@ -66,42 +147,65 @@ async def read_my_events(
     session: Annotated[AsyncSession, Depends(models.get_session)],
     current_user: Annotated[models.User, Depends(deps.get_current_user)],
     page: int = 1,
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=pagination.MAX_SIZE_PER_PAGE)] = SIZE_PER_PAGE,
+    include_total: bool = True,
 ) -> models.EventList:
-    query = (
-        select(models.DBEvent)
-        .where(models.DBEvent.user_id == current_user.id)
-        .offset((page - 1) * SIZE_PER_PAGE)
-        .limit(SIZE_PER_PAGE)
+    events, next_cursor = await pagination.paginate(
+        session,
+        select(models.DBEvent).where(models.DBEvent.user_id == current_user.id),
+        models.DBEvent,
+        page=page,
+        after=after,
+        limit=limit,
     )
-    result = await session.exec(query)
-    events = result.all()
 
-    page_count = int(
-        math.ceil(
-            (await session.exec(select(func.count(models.DBEvent.id)))).first()
-            / SIZE_PER_PAGE
-        )
-    )
+    page_count = None
+    if include_total:
+        total = (
+            await session.exec(
+                select(models.DBUser.events_amount).where(
+                    models.DBUser.id == current_user.id
+                )
+            )
+        ).one()
+        page_count = pagination.count_pages(total, limit)
 
     return models.EventList.model_validate(
         dict(
             events=events,
             page_count=page_count,
-            page=page,
-            size_per_page=SIZE_PER_PAGE,
+            page=page if after is None else None,
+            size_per_page=limit,
+            next_cursor=next_cursor,
         )
     )
 
 
+@router.get("/batch")
+async def read_events_batch(
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    ids: Annotated[str, Query(description="Comma separated event ids")],
+) -> list[models.Event]:
+    return await batch.read_by_ids(session, models.DBEvent, ids)
+
+
 @router.get("/{event_id}")
 async def read_event(
     event_id: int,
+    request: Request,
+    response: Response,
     session: Annotated[AsyncSession, Depends(models.get_session)],
 ) -> models.Event:
     db_event = await session.get(models.DBEvent, event_id)
     if db_event is None:
         raise HTTPException(status_code=404, detail="Event not found")
 
+    etag = http_cache.row_etag(db_event)
+    if http_cache.is_not_modified(request, etag):
+        return http_cache.not_modified_response(etag)
+    response.headers.update(http_cache.cache_headers(etag))
+
     return models.Event.model_validate(db_event)
 
 
@@ -109,8 +213,10 @@ async def read_event(
 async def update_event(
     event_id: int,
     event: models.UpdatedEvent,
+    response: Response,
     session: Annotated[AsyncSession, Depends(models.get_session)],
     current_user: Annotated[models.User, Depends(deps.get_current_user)],
+    if_match: Annotated[str | None, Header()] = None,
 ) -> models.Event:
     db_event = await session.get(models.DBEvent, event_id)
     if db_event is None:
@@ -121,16 +227,34 @@ async def update_event(
             status_code=403, detail="You are not the owner of this event"
         )
 
+    http_cache.check_if_match(if_match, http_cache.row_etag(db_event))
+
     event.author_name = db_event.author_name
     event.user_id = db_event.user_id
 
-    data = event.model_dump()
+    likes_delta = event.likes_amount - db_event.likes_amount
+    data = event.model_dump(exclude={"likes_amount"})
 
     db_event.sqlmodel_update(data)
 
     session.add(db_event)
+    try:
+        # the UPDATE only matches the version loaded above
+        await session.flush()
+    except StaleDataError:
+        raise http_cache.precondition_failed()
+
+    # increment records the change itself
+    if likes_delta:
+        await counters.increment(
+            session, models.DBEvent, event_id, "likes_amount", likes_delta
+        )
+    else:
+        changes.record(session, models.DBEvent, event_id)
     await session.commit()
-    await session.refresh(db_event)
+
+    await http_cache.invalidate("events")
+    response.headers["ETag"] = http_cache.row_etag(db_event)
 
     return models.Event.model_validate(db_event)
 
@@ -148,7 +272,52 @@ async def delete_event(
     if db_event.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="You are the owner of this event")
 
-    await session.delete(db_event)
+    # by id rather than the loaded version, which a like may have bumped
+    await session.exec(
+        delete(models.DBEvent)
+        .where(models.DBEvent.id == event_id)
+        .execution_options(synchronize_session=False)
+    )
+    changes.record(session, models.DBEvent, event_id, deleted=True)
+    await likes.delete_likes(session, "event", event_id)
+    await counters.increment(
+        session, models.DBUser, db_event.user_id, "events_amount", -1
+    )
     await session.commit()
 
+    await counters.row_counts.adjust(models.DBEvent, db_event, -1)
+    await http_cache.invalidate("events")
+
     return dict(message="Event deleted")
+
+
+@router.post("/{event_id}/like")
+async def like_event(
+    event_id: int,
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    current_user: Annotated[models.User, Depends(deps.get_current_user)],
+) -> models.LikeStatus:
+    return await likes.like(
+        session,
+        models.DBEvent,
+        "event",
+        event_id,
+        current_user.id,
+        not_found_detail="Event not found",
+    )
+
+
+@router.delete("/{event_id}/like")
+async def unlike_event(
+    event_id: int,
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    current_user: Annotated[models.User, Depends(deps.get_current_user)],
+) -> models.LikeStatus:
+    return await likes.unlike(
+        session,
+        models.DBEvent,
+        "event",
+        event_id,
+        current_user.id,
+        not_found_detail="Event not found",
+    )
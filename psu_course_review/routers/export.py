@@ -0,0 +1,39 @@
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+
+from typing import Literal
+
+import datetime
+
+from .. import models
+from .. import export
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+
+def export_response(model, schema, name: str, format: str, since) -> StreamingResponse:
+    return StreamingResponse(
+        export.stream_rows(model, schema, format=format, since=since),
+        media_type=export.MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{name}.{format}"',
+        },
+    )
+
+
+@router.get("/review_posts")
+async def export_review_posts(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    since: datetime.datetime | None = None,
+) -> StreamingResponse:
+    return export_response(
+        models.DBReviewPost, models.ReviewPost, "review_posts", format, since
+    )
+
+
+@router.get("/comments")
+async def export_comments(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    since: datetime.datetime | None = None,
+) -> StreamingResponse:
+    return export_response(models.DBComment, models.Comment, "comments", format, since)
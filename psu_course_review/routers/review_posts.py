@@ -1,14 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 
-from typing import Annotated
+from typing import Annotated, Literal
 
-from sqlmodel import select, func
+from sqlalchemy import insert
+from sqlalchemy.orm.exc import StaleDataError
+from sqlmodel import delete, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-import math
-
 from .. import models
+from .. import batch
+from .. import bulk
+from .. import changes
 from .. import deps
+from .. import likes
+from .. import counters
+from .. import courses
+from .. import pagination
+from .. import search
+from .. import http_cache
+from . import comments
 
 router = APIRouter(prefix="/review_posts", tags=["review_posts"])
 
@@ -25,43 +35,133 @@ async def create_review_post(
     db_review_post = models.DBReviewPost.model_validate(review_post)
 
     db_review_post.author_name = current_user.first_name + " " + current_user.last_name
-    db_review_post.user = current_user
+    db_review_post.user_id = current_user.id
 
     session.add(db_review_post)
+    await session.flush()
+    changes.record(session, models.DBReviewPost, db_review_post.id)
+
+    await counters.increment(
+        session, models.DBUser, current_user.id, "review_posts_amount", 1
+    )
+    await courses.add_review_post(session, db_review_post)
     await session.commit()
-    await session.refresh(db_review_post)
+
+    await counters.row_counts.adjust(models.DBReviewPost, db_review_post, 1)
+    await http_cache.invalidate("review_posts", "courses")
 
     return models.ReviewPost.model_validate(db_review_post)
 
 
+@router.post(
+    "/bulk",
+    openapi_extra=dict(
+        requestBody=dict(
+            content={
+                "application/json": dict(
+                    schema=dict(
+                        type="array",
+                        items={"$ref": "#/components/schemas/CreatedReviewPost"},
+                    )
+                ),
+                "application/x-ndjson": dict(schema=dict(type="string")),
+            }
+        )
+    ),
+)
+async def create_review_posts_bulk(
+    request: Request,
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    current_user: Annotated[models.User, Depends(deps.get_current_user)],
+) -> models.BulkResult:
+    author_name = current_user.first_name + " " + current_user.last_name
+
+    async def insert_review_posts(review_posts: list) -> list[int]:
+        db_review_posts = [
+            models.DBReviewPost.model_validate(
+                review_post,
+                update=dict(author_name=author_name, user_id=current_user.id),
+            )
+            for review_post in review_posts
+        ]
+
+        result = await session.exec(
+            insert(models.DBReviewPost).returning(
+                models.DBReviewPost.id, sort_by_parameter_order=True
+            ),
+            params=[
+                db_review_post.model_dump(exclude={"id"})
+                for db_review_post in db_review_posts
+            ],
+        )
+        ids = result.scalars().all()
+
+        changes.record_many(session, models.DBReviewPost, ids)
+        await counters.increment(
+            session, models.DBUser, current_user.id, "review_posts_amount", len(ids)
+        )
+        await courses.add_review_posts(session, db_review_posts)
+        return ids
+
+    result = await bulk.create_many(
+        session, request, models.CreatedReviewPost, insert_review_posts
+    )
+
+    if result.created_ids:
+        await counters.row_counts.invalidate(models.DBReviewPost)
+        await http_cache.invalidate("review_posts", "courses")
+
+    return result
+
+
 @router.get("")
 async def read_review_posts(
+    request: Request,
     session: Annotated[AsyncSession, Depends(models.get_session)],
     page: int = 1,
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=pagination.MAX_SIZE_PER_PAGE)] = SIZE_PER_PAGE,
+    include_total: bool = True,
+    course_code: str | None = None,
 ) -> models.ReviewPostList:
-    query = (
-        select(models.DBReviewPost)
-        .offset((page - 1) * SIZE_PER_PAGE)
-        .limit(SIZE_PER_PAGE)
-    )
-    result = await session.exec(query)
-    review_posts = result.all()
-
-    page_count = int(
-        math.ceil(
-            (await session.exec(select(func.count(models.DBReviewPost.id)))).first()
-            / SIZE_PER_PAGE
-        )
+    cache_key, cached_response = await http_cache.get_list_response(
+        request, "review_posts"
+    )
+    if cached_response is not None:
+        return cached_response
+
+    query = select(models.DBReviewPost)
+    filters = dict()
+    if course_code is not None:
+        filters["course_code"] = models.normalize_course_code(course_code)
+        query = query.where(models.DBReviewPost.course_code == filters["course_code"])
+
+    review_posts, next_cursor = await pagination.paginate(
+        session,
+        query,
+        models.DBReviewPost,
+        page=page,
+        after=after,
+        limit=limit,
     )
 
-    return models.ReviewPostList.model_validate(
+    page_count = None
+    if include_total:
+        page_count = pagination.count_pages(
+            await counters.row_counts.get(session, models.DBReviewPost, **filters),
+            limit,
+        )
+
+    review_post_list = models.ReviewPostList.model_validate(
         dict(
             review_posts=review_posts,
             page_count=page_count,
-            page=page,
-            size_per_page=SIZE_PER_PAGE,
+            page=page if after is None else None,
+            size_per_page=limit,
+            next_cursor=next_cursor,
         )
     )
+    return await http_cache.list_response(request, cache_key, review_post_list)
 
 
 @router.get("/my")
@@ -69,29 +169,116 @@ async def read_my_review_posts(
     session: Annotated[AsyncSession, Depends(models.get_session)],
     current_user: Annotated[models.User, Depends(deps.get_current_user)],
     page: int = 1,
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=pagination.MAX_SIZE_PER_PAGE)] = SIZE_PER_PAGE,
+    include_total: bool = True,
 ) -> models.ReviewPostList:
-    query = (
-        select(models.DBReviewPost)
-        .where(models.DBReviewPost.user_id == current_user.id)
-        .offset((page - 1) * SIZE_PER_PAGE)
-        .limit(SIZE_PER_PAGE)
-    )
-    result = await session.exec(query)
-    review_posts = result.all()
-
-    page_count = int(
-        math.ceil(
-            (await session.exec(select(func.count(models.DBReviewPost.id)))).first()
-            / SIZE_PER_PAGE
-        )
+    review_posts, next_cursor = await pagination.paginate(
+        session,
+        select(models.DBReviewPost).where(
+            models.DBReviewPost.user_id == current_user.id
+        ),
+        models.DBReviewPost,
+        page=page,
+        after=after,
+        limit=limit,
     )
 
+    page_count = None
+    if include_total:
+        total = (
+            await session.exec(
+                select(models.DBUser.review_posts_amount).where(
+                    models.DBUser.id == current_user.id
+                )
+            )
+        ).one()
+        page_count = pagination.count_pages(total, limit)
+
     return models.ReviewPostList.model_validate(
         dict(
             review_posts=review_posts,
             page_count=page_count,
-            page=page,
-            size_per_page=SIZE_PER_PAGE,
+            page=page if after is None else None,
+            size_per_page=limit,
+            next_cursor=next_cursor,
+        )
+    )
+
+
+@router.get("/search")
+async def search_review_posts(
+    request: Request,
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    q: Annotated[str, Query(min_length=1)],
+    after: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=pagination.MAX_SIZE_PER_PAGE)] = SIZE_PER_PAGE,
+) -> models.ReviewPostList:
+    cache_key, cached_response = await http_cache.get_list_response(
+        request, "review_posts"
+    )
+    if cached_response is not None:
+        return cached_response
+
+    review_posts, next_cursor = await search.search_review_posts(
+        session, q, after=after, limit=limit
+    )
+
+    review_post_list = models.ReviewPostList.model_validate(
+        dict(
+            review_posts=review_posts,
+            size_per_page=limit,
+            next_cursor=next_cursor,
+        )
+    )
+    return await http_cache.list_response(request, cache_key, review_post_list)
+
+
+@router.get("/batch")
+async def read_review_posts_batch(
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    ids: Annotated[str, Query(description="Comma separated review post ids")],
+) -> list[models.ReviewPost]:
+    return await batch.read_by_ids(session, models.DBReviewPost, ids)
+
+
+async def read_review_post_with_comments(
+    session: AsyncSession, review_post_id: int, limit: int
+) -> models.ReviewPostWithComments:
+    first_comments = (
+        select(models.DBComment.id)
+        .where(models.DBComment.review_post_id == review_post_id)
+        .order_by(models.DBComment.id)
+        .limit(limit + 1)
+    )
+
+    # one round trip for the post and its first page of comments
+    result = await session.exec(
+        select(models.DBReviewPost, models.DBComment)
+        .outerjoin(
+            models.DBComment,
+            (models.DBComment.review_post_id == models.DBReviewPost.id)
+            & models.DBComment.id.in_(first_comments),
+        )
+        .where(models.DBReviewPost.id == review_post_id)
+        .order_by(models.DBComment.id)
+    )
+    rows = result.all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Review Post not found")
+
+    db_comments = [db_comment for _, db_comment in rows if db_comment is not None]
+
+    next_cursor = None
+    if len(db_comments) > limit:
+        db_comments = db_comments[:limit]
+        next_cursor = pagination.encode_cursor(id=db_comments[-1].id)
+
+    return models.ReviewPostWithComments.model_validate(
+        dict(
+            models.ReviewPost.model_validate(rows[0][0]),
+            comments=db_comments,
+            comments_next_cursor=next_cursor,
         )
     )
 
@@ -99,12 +286,28 @@ async def read_my_review_posts(
 @router.get("/{review_post_id}")
 async def read_review_post(
     review_post_id: int,
+    request: Request,
+    response: Response,
     session: Annotated[AsyncSession, Depends(models.get_session)],
-) -> models.ReviewPost:
+    include: Literal["comments"] | None = None,
+    comments_limit: Annotated[
+        int, Query(ge=1, le=pagination.MAX_SIZE_PER_PAGE)
+    ] = comments.SIZE_PER_PAGE,
+) -> models.ReviewPost | models.ReviewPostWithComments:
+    if include == "comments":
+        return await read_review_post_with_comments(
+            session, review_post_id, comments_limit
+        )
+
     db_review_post = await session.get(models.DBReviewPost, review_post_id)
     if db_review_post is None:
         raise HTTPException(status_code=404, detail="Review Post not found")
 
+    etag = http_cache.row_etag(db_review_post)
+    if http_cache.is_not_modified(request, etag):
+        return http_cache.not_modified_response(etag)
+    response.headers.update(http_cache.cache_headers(etag))
+
     return models.ReviewPost.model_validate(db_review_post)
 
 
@@ -112,8 +315,10 @@ async def read_review_post(
 async def update_review_post(
     review_post_id: int,
     review_post: models.UpdatedReviewPost,
+    response: Response,
     session: Annotated[AsyncSession, Depends(models.get_session)],
     current_user: Annotated[models.User, Depends(deps.get_current_user)],
+    if_match: Annotated[str | None, Header()] = None,
 ) -> models.ReviewPost:
     db_review_post = await session.get(models.DBReviewPost, review_post_id)
     if db_review_post is None:
@@ -122,17 +327,53 @@ async def update_review_post(
     if db_review_post.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Forbidden, not your review post")
 
+    http_cache.check_if_match(if_match, http_cache.row_etag(db_review_post))
+
     review_post.author_name = db_review_post.author_name
-    review_post.comments_amount = db_review_post.comments_amount
     review_post.user_id = db_review_post.user_id
 
-    data = review_post.model_dump()
+    previous_review_post = models.ReviewPost.model_validate(db_review_post)
+
+    # counters are only ever changed with relative, atomic UPDATEs
+    likes_delta = review_post.likes_amount - db_review_post.likes_amount
+    data = review_post.model_dump(exclude={"likes_amount", "comments_amount"})
 
     db_review_post.sqlmodel_update(data)
 
     session.add(db_review_post)
+    try:
+        # the UPDATE only matches the version loaded above
+        await session.flush()
+    except StaleDataError:
+        raise http_cache.precondition_failed()
+
+    # increment records the change itself
+    if likes_delta:
+        await counters.increment(
+            session, models.DBReviewPost, review_post_id, "likes_amount", likes_delta
+        )
+    else:
+        changes.record(session, models.DBReviewPost, review_post_id)
+
+    if previous_review_post.course_code != db_review_post.course_code:
+        await courses.remove_review_post(session, previous_review_post)
+        await courses.add_review_post(session, db_review_post)
+    else:
+        if likes_delta:
+            await courses.increment_for_review_post(
+                session, review_post_id, "likes_amount", likes_delta
+            )
+        if previous_review_post.course_name != db_review_post.course_name:
+            await courses.rename(
+                session, db_review_post.course_code, db_review_post.course_name
+            )
     await session.commit()
-    await session.refresh(db_review_post)
+
+    if previous_review_post.course_code != db_review_post.course_code:
+        await counters.row_counts.adjust(models.DBReviewPost, previous_review_post, -1)
+        await counters.row_counts.adjust(models.DBReviewPost, db_review_post, 1)
+    await http_cache.invalidate("review_posts", "courses")
+    response.headers["ETag"] = http_cache.row_etag(db_review_post)
 
     return models.ReviewPost.model_validate(db_review_post)
 
@@ -150,7 +391,63 @@ async def delete_review_post(
     if db_review_post.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Forbidden, not your review post")
 
-    await session.delete(db_review_post)
+    # the comments go with the post through ON DELETE CASCADE, so their
+    # tombstones and likes are written before the post is deleted
+    in_review_post = models.DBComment.review_post_id == review_post_id
+    await changes.record_deleted(session, models.DBComment, in_review_post)
+    await likes.delete_likes_of(
+        session, "comment", select(models.DBComment.id).where(in_review_post)
+    )
+
+    await courses.remove_review_post(session, db_review_post)
+    # by id, not by the version loaded above, a like or a comment landing
+    # in between bumps the version without making the delete any less valid
+    await session.exec(
+        delete(models.DBReviewPost)
+        .where(models.DBReviewPost.id == review_post_id)
+        .execution_options(synchronize_session=False)
+    )
+    changes.record(session, models.DBReviewPost, review_post_id, deleted=True)
+    await likes.delete_likes(session, "review_post", review_post_id)
+    await counters.increment(
+        session, models.DBUser, db_review_post.user_id, "review_posts_amount", -1
+    )
     await session.commit()
 
+    await counters.row_counts.adjust(models.DBReviewPost, db_review_post, -1)
+    await counters.row_counts.invalidate(models.DBComment)
+    await http_cache.invalidate("review_posts", "comments", "courses")
+
     return dict(message="Review Post deleted")
+
+
+@router.post("/{review_post_id}/like")
+async def like_review_post(
+    review_post_id: int,
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    current_user: Annotated[models.User, Depends(deps.get_current_user)],
+) -> models.LikeStatus:
+    return await likes.like(
+        session,
+        models.DBReviewPost,
+        "review_post",
+        review_post_id,
+        current_user.id,
+        not_found_detail="Review Post not found",
+    )
+
+
+@router.delete("/{review_post_id}/like")
+async def unlike_review_post(
+    review_post_id: int,
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    current_user: Annotated[models.User, Depends(deps.get_current_user)],
+) -> models.LikeStatus:
+    return await likes.unlike(
+        session,
+        models.DBReviewPost,
+        "review_post",
+        review_post_id,
+        current_user.id,
+        not_found_detail="Review Post not found",
+    )
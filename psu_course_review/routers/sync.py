@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends, Query
+
+from typing import Annotated
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .. import models
+from .. import changes
+from .. import pagination
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+
+SIZE_PER_PAGE = 100
+
+
+@router.get("")
+async def read_changes(
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    since: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=pagination.MAX_SIZE_PER_PAGE)] = SIZE_PER_PAGE,
+) -> models.ChangeList:
+    return await changes.read_changes(session, since=since, limit=limit)
@@ -1,40 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.exc import IntegrityError
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlmodel import select
 
 from typing import Annotated
 
 import datetime
 
+from .. import batch
 from .. import deps
 from .. import models
+from .. import ratelimit
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.post("/create")
 async def create_user(
+    request: Request,
     user_info: models.RegisteredUser,
     session: Annotated[AsyncSession, Depends(models.get_session)],
 ) -> models.User:
+    await ratelimit.check(request, user_info.username)
 
-    result = await session.exec(
-        select(models.DBUser).where(models.DBUser.username == user_info.username)
-    )
-
-    user = result.one_or_none()
+    user = models.DBUser.model_validate(user_info)
+    await user.set_password(user_info.password)
+    session.add(user)
 
-    if user:
+    # the unique indexes on username and email reject duplicates
+    try:
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
-            detail="This username is exists.",
+            detail="This username or email is exists.",
         )
 
-    user = models.DBUser.model_validate(user_info)
-    await user.set_password(user_info.password)
-    session.add(user)
-    await session.commit()
-
     return user
 
 
@@ -43,6 +44,15 @@ def get_me(current_user: models.User = Depends(deps.get_current_user)) -> models
     return current_user
 
 
+@router.get("/batch")
+async def get_users_batch(
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    ids: Annotated[str, Query(description="Comma separated user ids")],
+    current_user: models.User = Depends(deps.get_current_user),
+) -> list[models.User]:
+    return await batch.read_by_ids(session, models.DBUser, ids)
+
+
 @router.get("/{user_id}")
 async def get_user(
     user_id: int,
@@ -86,6 +96,8 @@ async def change_password(
     session.add(user)
     await session.commit()
 
+    await deps.invalidate_user(user.id)
+
     return {"message": "Password changed successfully"}
 
 
@@ -115,7 +127,16 @@ async def update_user(
     db_user.updated_date = datetime.datetime.now()
     db_user.sqlmodel_update(user_update)
     session.add(db_user)
-    await session.commit()
-    await session.refresh(db_user)
+
+    try:
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This username or email is exists.",
+        )
+
+    await deps.invalidate_user(db_user.id)
 
     return db_user
@@ -0,0 +1,91 @@
+from fastapi import HTTPException, status
+from sqlalchemy import and_, column, func, literal_column, or_, table, text
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import models
+from . import pagination
+
+
+class SearchBackend:
+    # select (id, score) of the review posts matching q, higher scores rank first
+    def ranked_ids(self, q: str):
+        raise NotImplementedError
+
+
+class PostgresSearchBackend(SearchBackend):
+    def ranked_ids(self, q: str):
+        document = literal_column(models.review_posts.SEARCH_DOCUMENT)
+        query = func.plainto_tsquery("simple", q)
+
+        return select(
+            models.DBReviewPost.id.label("id"),
+            func.ts_rank(document, query).label("score"),
+        ).where(document.op("@@")(query))
+
+
+class SQLiteSearchBackend(SearchBackend):
+    fts = table("review_posts_fts", column("rowid"))
+
+    def ranked_ids(self, q: str):
+        # quote every term so user input is never parsed as FTS5 syntax
+        terms = ['"' + term.replace('"', '""') + '"' for term in q.split()]
+
+        return select(
+            self.fts.c.rowid.label("id"),
+            (-func.bm25(literal_column("review_posts_fts"))).label("score"),
+        ).where(text("review_posts_fts MATCH :terms").bindparams(terms=" ".join(terms)))
+
+
+backends: dict[str, SearchBackend] = dict(
+    postgresql=PostgresSearchBackend(),
+    sqlite=SQLiteSearchBackend(),
+)
+
+
+def get_backend(dialect_name: str) -> SearchBackend:
+    backend = backends.get(dialect_name)
+    if backend is None:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Search is not supported on this database",
+        )
+    return backend
+
+
+async def search_review_posts(
+    session: AsyncSession, q: str, after: str | None = None, limit: int = 50
+) -> tuple[list, str | None]:
+    if not q.split():
+        return [], None
+
+    ranked = get_backend(session.bind.dialect.name).ranked_ids(q).subquery()
+
+    query = select(models.DBReviewPost, ranked.c.score).join(
+        ranked, ranked.c.id == models.DBReviewPost.id
+    )
+
+    if after is not None:
+        keys = pagination.decode_cursor(after)
+        last_score, last_id = keys.get("score"), keys.get("id")
+        if not isinstance(last_score, (int, float)) or not isinstance(last_id, int):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+            )
+        query = query.where(
+            or_(
+                ranked.c.score < last_score,
+                and_(ranked.c.score == last_score, ranked.c.id > last_id),
+            )
+        )
+
+    query = query.order_by(ranked.c.score.desc(), ranked.c.id).limit(limit + 1)
+    rows = (await session.exec(query)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_review_post, last_score = rows[-1]
+        next_cursor = pagination.encode_cursor(score=last_score, id=last_review_post.id)
+
+    return [review_post for review_post, _ in rows], next_cursor
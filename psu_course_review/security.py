@@ -1,4 +1,5 @@
 import datetime
+import uuid
 from typing import Any, Union
 
 import jwt
@@ -19,7 +20,8 @@ def create_access_token(data: dict, expires_delta: datetime.timedelta | None = N
         expire = datetime.datetime.now(tz=datetime.timezone.utc) + datetime.timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
-    to_encode.update({"exp": expire})
+    # the jti lets a single token be revoked before it expires
+    to_encode.update({"exp": expire, "type": "access", "jti": uuid.uuid4().hex})
 
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
@@ -35,6 +37,6 @@ def create_refresh_token(
         expire = datetime.datetime.now(tz=datetime.timezone.utc) + datetime.timedelta(
             minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES
         )
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "type": "refresh", "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
\ No newline at end of file
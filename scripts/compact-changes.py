@@ -0,0 +1,26 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory of 'psu_course_review' to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from psu_course_review import config, logs, maintenance, models
+
+import asyncio
+
+
+async def main():
+    async with models.session_factory() as session:
+        superseded, expired = await maintenance.compact_changes(session)
+    await models.close_session()
+
+    print(f"Removed {superseded} superseded changes and {expired} expired tombstones")
+
+
+if __name__ == "__main__":
+    settings = config.get_settings()
+    logs.setup_logging(settings)
+    models.init_db(settings)
+    asyncio.run(main())
+    logs.shutdown_logging()
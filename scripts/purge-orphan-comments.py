@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory of 'psu_course_review' to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from psu_course_review import config, logs, maintenance, models
+
+import argparse
+import asyncio
+
+
+async def main(batch_size: int):
+    async with models.session_factory() as session:
+        purged = await maintenance.purge_orphan_comments(session, batch_size)
+    await models.close_session()
+
+    print(f"Purged {purged} orphan comments")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Delete comments whose review post no longer exists"
+    )
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    settings = config.get_settings()
+    logs.setup_logging(settings)
+    models.init_db(settings)
+    asyncio.run(main(args.batch_size))
+    logs.shutdown_logging()
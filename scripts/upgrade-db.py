@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+# Add the parent directory of 'psu_course_review' to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from psu_course_review import config, courses, logs, maintenance, models
+
+import asyncio
+
+
+async def main():
+    # brings a database created by an older version up to the current models
+    try:
+        async with models.engine.begin() as conn:
+            added = await conn.run_sync(maintenance.upgrade_schema)
+    except ValueError as e:
+        # nothing was changed, the rows are left for someone to merge
+        print(e)
+        await models.close_session()
+        return 1
+    print(f"Added columns: {', '.join(added) or 'none'}")
+
+    async with models.session_factory() as session:
+        purged = await maintenance.purge_orphan_comments(session)
+    print(f"Purged {purged} orphan comments")
+
+    async with models.engine.begin() as conn:
+        if await conn.run_sync(maintenance.cascade_comment_deletes):
+            print("Comments are now deleted with their review post")
+
+    async with models.session_factory() as session:
+        normalized = await maintenance.normalize_course_codes(session)
+        print(f"Normalized the course code of {normalized} review posts")
+
+        await maintenance.recount_counters(session)
+        print("Recounted counters")
+
+        rebuilt = await courses.rebuild(session)
+        print(f"Rebuilt {rebuilt} courses")
+
+    await models.close_session()
+    return 0
+
+
+if __name__ == "__main__":
+    settings = config.get_settings()
+    logs.setup_logging(settings)
+    models.init_db(settings)
+    code = asyncio.run(main())
+    logs.shutdown_logging()
+    sys.exit(code)
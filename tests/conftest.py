@@ -16,8 +16,17 @@ from httpx import AsyncClient, ASGITransport
 
 
 from pydantic_settings import SettingsConfigDict
-
-from psu_course_review import models, config, main, security
+from sqlalchemy import event
+
+from psu_course_review import (
+    models,
+    config,
+    counters,
+    main,
+    security,
+    http_cache,
+    ratelimit,
+)
 
 import pytest
 import pytest_asyncio
@@ -61,13 +70,56 @@ async def get_session() -> models.AsyncIterator[models.AsyncSession]:
     settings = SettingsTesting()
     models.init_db(settings)
 
-    async_session = models.sessionmaker(
-        models.engine, class_=models.AsyncSession, expire_on_commit=False
-    )
-    async with async_session() as session:
+    async with models.session_factory() as session:
         yield session
 
 
+@pytest_asyncio.fixture(autouse=True)
+async def clear_response_cache():
+    # fixtures insert rows directly, behind the cached list pages
+    await http_cache.response_cache.clear()
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def clear_rate_limits():
+    # every test logs in from the same client address
+    await ratelimit.clear()
+
+
+@pytest.fixture(name="statements")
+def statement_log() -> list[str]:
+    statements = []
+
+    def log_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = models.engine.sync_engine
+    event.listen(engine, "before_cursor_execute", log_statement)
+    yield statements
+    event.remove(engine, "before_cursor_execute", log_statement)
+
+
+@pytest.fixture(name="like_after_get")
+def like_after_get_fixture(monkeypatch):
+    # arms a like from another session right after a handler loads the row,
+    # which bumps its version behind the handler's back
+    get = models.AsyncSession.get
+
+    def arm(model, row_id: int):
+        async def get_then_like(self, entity, ident, *args, **kwargs):
+            row = await get(self, entity, ident, *args, **kwargs)
+            if entity is model and ident == row_id:
+                monkeypatch.setattr(models.AsyncSession, "get", get)
+                async with models.session_factory() as other:
+                    await counters.increment(other, model, row_id, "likes_amount")
+                    await other.commit()
+            return row
+
+        monkeypatch.setattr(models.AsyncSession, "get", get_then_like)
+
+    return arm
+
+
 @pytest_asyncio.fixture(name="user1")
 async def example_user1(session: models.AsyncSession) -> models.DBUser:
     password = "123456"
@@ -0,0 +1,331 @@
+from fastapi import HTTPException
+from httpx import AsyncClient
+from psu_course_review import caches, deps, models, passwords, ratelimit, revocation
+import asyncio
+import bcrypt
+import jwt
+import logging
+import pytest
+import time
+
+
+@pytest.mark.asyncio
+async def test_authentication(client: AsyncClient, user1: models.DBUser):
+    payload = {"username": user1.username, "password": "123456"}
+    response = await client.post("/token", data=payload)
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["user_id"] == user1.id
+    assert data["token_type"] == "Bearer"
+
+    response = await client.get(
+        "/users/me",
+        headers={"Authorization": f"{data['token_type']} {data['access_token']}"},
+    )
+    assert response.status_code == 200
+    assert response.json()["id"] == user1.id
+
+
+@pytest.mark.asyncio
+async def test_authentication_with_email(client: AsyncClient, user1: models.DBUser):
+    payload = {"username": user1.email, "password": "123456"}
+    response = await client.post("/token", data=payload)
+
+    assert response.status_code == 200
+    assert response.json()["user_id"] == user1.id
+
+
+@pytest.mark.asyncio
+async def test_authentication_wrong_password(client: AsyncClient, user1: models.DBUser):
+    payload = {"username": user1.username, "password": "wrong password"}
+    response = await client.post("/token", data=payload)
+
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_authentication_rehashes_weak_password(
+    client: AsyncClient, session: models.AsyncSession
+):
+    weak_rounds = 4 if passwords.hasher.rounds != 4 else 5
+    user = models.DBUser(
+        email="rehash@test.com",
+        username="rehash",
+        first_name="Firstname",
+        last_name="lastname",
+        password=bcrypt.hashpw(b"123456", bcrypt.gensalt(rounds=weak_rounds)).decode(
+            "utf-8"
+        ),
+    )
+    session.add(user)
+    await session.commit()
+    assert user.password_needs_rehash()
+
+    payload = {"username": "rehash", "password": "123456"}
+    response = await client.post("/token", data=payload)
+    assert response.status_code == 200
+
+    await session.refresh(user)
+    assert not user.password_needs_rehash()
+    assert await user.verify_password("123456")
+
+
+@pytest.mark.asyncio
+async def test_access_token_claims_are_cached(
+    client: AsyncClient, user1: models.DBUser, monkeypatch
+):
+    payload = {"username": user1.username, "password": "123456"}
+    response = await client.post("/token", data=payload)
+    data = response.json()
+    headers = {"Authorization": f"{data['token_type']} {data['access_token']}"}
+
+    decoded = []
+    decode = deps.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        decoded.append(args[0])
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(deps.jwt, "decode", counting_decode)
+
+    for _ in range(3):
+        response = await client.get("/users/me", headers=headers)
+        assert response.status_code == 200
+
+    assert len(decoded) == 1
+
+    claims = await deps.get_current_claims(data["access_token"])
+    assert claims.sub == user1.id
+    assert claims.roles == user1.roles
+    assert claims.status == "active"
+
+    deps.RoleChecker("user")(await deps.get_current_active_user(claims))
+    with pytest.raises(HTTPException) as e:
+        deps.RoleChecker("admin")(await deps.get_current_active_user(claims))
+    assert e.value.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_rotation(client: AsyncClient, user1: models.DBUser):
+    payload = {"username": user1.username, "password": "123456"}
+    response = await client.post("/token", data=payload)
+    refresh_token = response.json()["refresh_token"]
+
+    response = await client.post(
+        "/token/refresh", json={"refresh_token": refresh_token}
+    )
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["user_id"] == user1.id
+    assert data["refresh_token"] != refresh_token
+
+    response = await client.get(
+        "/users/me",
+        headers={"Authorization": f"{data['token_type']} {data['access_token']}"},
+    )
+    assert response.status_code == 200
+
+    # a refresh token is exchanged once, a replay is rejected
+    response = await client.post(
+        "/token/refresh", json={"refresh_token": refresh_token}
+    )
+    assert response.status_code == 401
+
+    # and it is not accepted as an access token
+    response = await client.get(
+        "/users/me", headers={"Authorization": f"Bearer {data['refresh_token']}"}
+    )
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_logout_revokes_tokens(client: AsyncClient, user1: models.DBUser):
+    payload = {"username": user1.username, "password": "123456"}
+    response = await client.post("/token", data=payload)
+    data = response.json()
+    headers = {"Authorization": f"{data['token_type']} {data['access_token']}"}
+
+    response = await client.get("/users/me", headers=headers)
+    assert response.status_code == 200
+
+    response = await client.post(
+        "/logout", json={"refresh_token": data["refresh_token"]}, headers=headers
+    )
+    assert response.status_code == 200
+
+    response = await client.get("/users/me", headers=headers)
+    assert response.status_code == 401
+
+    response = await client.post(
+        "/token/refresh", json={"refresh_token": data["refresh_token"]}
+    )
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_logout_without_refresh_token_ends_login(
+    client: AsyncClient, user1: models.DBUser
+):
+    payload = {"username": user1.username, "password": "123456"}
+    response = await client.post("/token", data=payload)
+    data = response.json()
+    headers = {"Authorization": f"{data['token_type']} {data['access_token']}"}
+
+    response = await client.post("/logout", headers=headers)
+    assert response.status_code == 200
+
+    response = await client.post(
+        "/token/refresh", json={"refresh_token": data["refresh_token"]}
+    )
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_concurrent_refresh_succeeds_once(
+    client: AsyncClient, user1: models.DBUser
+):
+    payload = {"username": user1.username, "password": "123456"}
+    response = await client.post("/token", data=payload)
+    refresh_token = response.json()["refresh_token"]
+
+    responses = await asyncio.gather(
+        *(
+            client.post("/token/refresh", json={"refresh_token": refresh_token})
+            for _ in range(2)
+        )
+    )
+    assert sorted(response.status_code for response in responses) == [200, 401]
+
+    # the replay revoked the whole family, the winner's tokens included
+    data = next(response.json() for response in responses if response.is_success)
+    response = await client.get(
+        "/users/me", headers={"Authorization": f"Bearer {data['access_token']}"}
+    )
+    assert response.status_code == 401
+
+    response = await client.post(
+        "/token/refresh", json={"refresh_token": data["refresh_token"]}
+    )
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_token_revoked_by_another_worker(
+    client: AsyncClient, user1: models.DBUser
+):
+    payload = {"username": user1.username, "password": "123456"}
+    response = await client.post("/token", data=payload)
+    access_token = response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    response = await client.get("/users/me", headers=headers)
+    assert response.status_code == 200
+
+    # only in the shared store, as a logout on another worker leaves it
+    claims = jwt.decode(access_token, options=dict(verify_signature=False))
+    await revocation.revoked_tokens.store.add(claims["jti"], claims["exp"])
+
+    # trusted until the recent check expires
+    response = await client.get("/users/me", headers=headers)
+    assert response.status_code == 200
+
+    await revocation.revoked_tokens.checks.clear()
+    response = await client.get("/users/me", headers=headers)
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_revocation_store_pruned_periodically(session: models.AsyncSession):
+    store = revocation.DatabaseRevocationStore()
+    revoked_tokens = revocation.RevocationList(
+        store, caches.MemoryCache(), prune_interval=0
+    )
+
+    now = int(time.time())
+    assert await store.add("expired", now - 1)
+    assert not await store.add("expired", now - 1)
+
+    assert await revoked_tokens.revoke("current", now + 60)
+    assert not await revoked_tokens.revoke("current", now + 60)
+
+    assert not await store.contains("expired")
+    assert await store.contains("current")
+
+
+@pytest.mark.asyncio
+async def test_authentication_rate_limited_per_username(
+    client: AsyncClient, user1: models.DBUser
+):
+    payload = {"username": user1.username, "password": "wrong password"}
+    for _ in range(ratelimit.username_limiter.capacity):
+        response = await client.post("/token", data=payload)
+        assert response.status_code == 401
+
+    response = await client.post("/token", data=payload)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+    # the bucket is per username, another account is unaffected
+    response = await client.post(
+        "/token", data={"username": "someone-else", "password": "123456"}
+    )
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_sheds_load():
+    hasher = passwords.PasswordHasher(max_workers=1, rounds=4, max_queue=1)
+    release = asyncio.Event()
+
+    def blocking():
+        return True
+
+    async def hold():
+        # keeps the only permit until released
+        await hasher._semaphore.acquire()
+        await release.wait()
+        hasher._semaphore.release()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    queued = asyncio.create_task(hasher._run(blocking))
+    await asyncio.sleep(0)
+    assert hasher.queue_depth == 1
+
+    with pytest.raises(HTTPException) as e:
+        await hasher.verify(
+            "123456", bcrypt.hashpw(b"123456", bcrypt.gensalt(4)).decode()
+        )
+    assert e.value.status_code == 429
+    assert "Retry-After" in e.value.headers
+
+    release.set()
+    await holder
+    assert await queued
+    hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_rejected_token_is_logged(client: AsyncClient, caplog):
+    # the package logger does not propagate, its records go to the queue
+    logger = logging.getLogger("psu_course_review")
+    logger.addHandler(caplog.handler)
+    try:
+        with caplog.at_level(logging.INFO, logger="psu_course_review"):
+            response = await client.get(
+                "/users/me", headers={"Authorization": "Bearer not-a-token"}
+            )
+    finally:
+        logger.removeHandler(caplog.handler)
+
+    assert response.status_code == 401
+    [record] = [r for r in caplog.records if getattr(r, "event", None)]
+    assert record.name == "psu_course_review.deps"
+    assert record.levelno == logging.INFO
+    assert record.event == "auth.rejected"
+    assert record.error
+    # the token itself is never logged
+    assert "not-a-token" not in record.getMessage()
+    assert "not-a-token" not in record.error
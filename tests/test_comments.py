@@ -1,5 +1,8 @@
+import asyncio
+
 from httpx import AsyncClient
-from psu_course_review import models
+from sqlalchemy import delete, text
+from psu_course_review import models, maintenance
 import pytest
 
 
@@ -124,6 +127,24 @@ async def test_delete_comment(
     assert response.json()["message"] == "Comment deleted"
 
 
+@pytest.mark.asyncio
+async def test_delete_comment_liked_meanwhile(
+    client: AsyncClient,
+    comment_user1: models.DBComment,
+    token_user1: models.Token,
+    like_after_get,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+
+    like_after_get(models.DBComment, comment_user1.id)
+    response = await client.delete(f"/comments/{comment_user1.id}", headers=headers)
+
+    assert response.status_code == 200
+
+    response = await client.get(f"/comments/{comment_user1.id}")
+    assert response.status_code == 404
+
+
 @pytest.mark.asyncio
 async def test_delete_other_user_comment(
     client: AsyncClient,
@@ -158,3 +179,149 @@ async def test_list_comments(client: AsyncClient, comment_user1: models.DBCommen
     assert check_comment["likes_amount"] == comment_user1.likes_amount
     assert check_comment["review_post_id"] == comment_user1.review_post_id
     assert check_comment["user_id"] == comment_user1.user_id
+
+
+@pytest.mark.asyncio
+async def test_list_comments_by_review_post_with_cursor(
+    client: AsyncClient,
+    review_post_user1: models.DBReviewPost,
+    token_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    for i in range(3):
+        payload = {
+            "comment_text": f"This is cursor comment {i}",
+            "review_post_id": review_post_user1.id,
+        }
+        response = await client.post("/comments", json=payload, headers=headers)
+        assert response.status_code == 200
+
+    response = await client.get(
+        f"/comments/review_post/{review_post_user1.id}", params={"limit": 2}
+    )
+    first_page = response.json()
+
+    assert response.status_code == 200
+    assert first_page["page"] == 1
+    assert first_page["size_per_page"] == 2
+    assert first_page["next_cursor"] is not None
+
+    response = await client.get(
+        f"/comments/review_post/{review_post_user1.id}",
+        params={"limit": 2, "after": first_page["next_cursor"]},
+    )
+    second_page = response.json()
+
+    assert response.status_code == 200
+    assert second_page["page"] is None
+    ids = [c["id"] for c in first_page["comments"] + second_page["comments"]]
+    assert ids == sorted(set(ids))
+    assert all(
+        c["review_post_id"] == review_post_user1.id for c in second_page["comments"]
+    )
+
+
+@pytest.mark.asyncio
+async def test_parallel_create_comments_amount(
+    client: AsyncClient,
+    token_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    payload = {
+        "review_post_title": "This is a popular review post",
+        "review_post_text": "This is a popular review post",
+        "course_code": "111-222",
+        "course_name": "the course",
+    }
+    response = await client.post("/review_posts", json=payload, headers=headers)
+    review_post_id = response.json()["id"]
+    assert response.status_code == 200
+
+    comment_payload = {
+        "comment_text": "This is a parallel comment",
+        "review_post_id": review_post_id,
+    }
+    responses = await asyncio.gather(
+        *[
+            client.post("/comments", json=comment_payload, headers=headers)
+            for _ in range(200)
+        ]
+    )
+    assert all(response.status_code == 200 for response in responses)
+
+    response = await client.get(f"/review_posts/{review_post_id}")
+    assert response.status_code == 200
+    assert response.json()["comments_amount"] == 200
+
+
+@pytest.mark.asyncio
+async def test_create_comment_review_post_not_found(
+    client: AsyncClient,
+    token_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    payload = {"comment_text": "This is a comment", "review_post_id": 999999}
+    response = await client.post("/comments", json=payload, headers=headers)
+
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_read_comment_not_modified(
+    client: AsyncClient,
+    comment_user1: models.DBComment,
+):
+    response = await client.get(f"/comments/{comment_user1.id}")
+    etag = response.headers["etag"]
+
+    assert response.status_code == 200
+
+    response = await client.get(
+        f"/comments/{comment_user1.id}", headers={"If-None-Match": etag}
+    )
+
+    assert response.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_purge_orphan_comments(
+    session: models.AsyncSession,
+    user1: models.DBUser,
+):
+    review_post = models.DBReviewPost(
+        review_post_title="An orphaning review post",
+        review_post_text="This is a review post",
+        course_code="111-222",
+        course_name="the course",
+        user=user1,
+    )
+    session.add(review_post)
+    await session.commit()
+
+    comments = [
+        models.DBComment(
+            comment_text=f"Orphan {i}", review_post_id=review_post.id, user=user1
+        )
+        for i in range(3)
+    ]
+    session.add_all(comments)
+    await session.commit()
+    comment_ids = [comment.id for comment in comments]
+
+    # leave orphans behind the way deletes did before ON DELETE CASCADE, on a
+    # connection of its own so no pooled connection is left without foreign keys
+    async with models.engine.connect() as connection:
+        await connection.execute(text("PRAGMA foreign_keys=OFF"))
+        await connection.execute(
+            delete(models.DBReviewPost).where(models.DBReviewPost.id == review_post.id)
+        )
+        await connection.commit()
+        await connection.execute(text("PRAGMA foreign_keys=ON"))
+
+    purged = await maintenance.purge_orphan_comments(session, batch_size=2)
+
+    assert purged == 3
+    result = await session.exec(
+        models.select(models.DBComment).where(models.DBComment.id.in_(comment_ids))
+    )
+    assert result.all() == []
@@ -0,0 +1,212 @@
+from httpx import AsyncClient
+from psu_course_review import courses, models
+from sqlmodel import delete
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_read_course_review_posts(
+    client: AsyncClient,
+    token_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    payload = {
+        "review_post_title": "This is a course review post",
+        "review_post_text": "This is a course review post",
+        "course_code": " ab - 240 ",
+        "course_name": "the course",
+    }
+    response = await client.post("/review_posts", json=payload, headers=headers)
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["course_code"] == "AB-240"
+
+    response = await client.get("/review_posts", params={"course_code": "ab-240"})
+    filtered = response.json()
+
+    assert response.status_code == 200
+    assert filtered["page_count"] == 1
+    assert [review_post["id"] for review_post in filtered["review_posts"]] == [
+        data["id"]
+    ]
+
+    response = await client.get("/courses/AB-240/review_posts")
+    feed = response.json()
+
+    assert response.status_code == 200
+    assert feed["review_posts"] == filtered["review_posts"]
+
+    response = await client.get("/courses/AB-999/review_posts")
+    assert response.status_code == 200
+    assert response.json()["review_posts"] == []
+
+
+@pytest.mark.asyncio
+async def test_read_courses(
+    client: AsyncClient,
+    token_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    payload = {
+        "review_post_title": "This is a course review post",
+        "review_post_text": "This is a course review post",
+        "course_code": "CD-100",
+        "course_name": "the popular course",
+    }
+    review_post_ids = []
+    for _ in range(3):
+        response = await client.post("/review_posts", json=payload, headers=headers)
+        assert response.status_code == 200
+        review_post_ids.append(response.json()["id"])
+
+    comment_payload = {"comment_text": "Nice", "review_post_id": review_post_ids[0]}
+    response = await client.post("/comments", json=comment_payload, headers=headers)
+    assert response.status_code == 200
+
+    payload["likes_amount"] = 4
+    response = await client.put(
+        f"/review_posts/{review_post_ids[1]}", json=payload, headers=headers
+    )
+    assert response.status_code == 200
+
+    response = await client.delete(
+        f"/review_posts/{review_post_ids[2]}", headers=headers
+    )
+    assert response.status_code == 200
+
+    response = await client.get("/courses", params={"sort": "popularity"})
+    data = response.json()
+
+    assert response.status_code == 200
+    popularity = [
+        course["review_posts_amount"]
+        + course["likes_amount"]
+        + course["comments_amount"]
+        for course in data["courses"]
+    ]
+    assert popularity == sorted(popularity, reverse=True)
+
+    course = next(c for c in data["courses"] if c["course_code"] == "CD-100")
+    assert course["course_name"] == "the popular course"
+    assert course["review_posts_amount"] == 2
+    assert course["comments_amount"] == 1
+    assert course["likes_amount"] == 4
+    assert course["latest_review_date"] is not None
+
+    response = await client.get("/courses", params={"sort": "unknown"})
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_course_follows_moved_renamed_and_deleted_review_posts(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    token_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    payload = {
+        "review_post_title": "This is a course review post",
+        "review_post_text": "This is a course review post",
+        "course_code": "EF-100",
+        "course_name": "the course",
+    }
+    response = await client.post("/review_posts", json=payload, headers=headers)
+    older = response.json()
+    response = await client.post("/review_posts", json=payload, headers=headers)
+    newer = response.json()
+
+    async def read_course(course_code: str) -> models.DBCourse | None:
+        course = await session.get(models.DBCourse, course_code)
+        if course is not None:
+            await session.refresh(course)
+        return course
+
+    # renaming without changing the code renames the course
+    response = await client.put(
+        f"/review_posts/{newer['id']}",
+        json=payload | {"course_name": "the renamed course"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    course = await read_course("EF-100")
+    assert course.course_name == "the renamed course"
+
+    # a moved post keeps its date, the old course falls back to its other post
+    response = await client.put(
+        f"/review_posts/{newer['id']}",
+        json=payload | {"course_code": "EF-200"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+    course = await read_course("EF-100")
+    assert course.review_posts_amount == 1
+    assert course.latest_review_date.isoformat() == older["created_at"]
+    moved_to = await read_course("EF-200")
+    assert moved_to.latest_review_date.isoformat() == newer["created_at"]
+
+    response = await client.delete(f"/review_posts/{older['id']}", headers=headers)
+    assert response.status_code == 200
+
+    course = await read_course("EF-100")
+    assert course.review_posts_amount == 0
+    assert course.latest_review_date is None
+
+
+@pytest.mark.asyncio
+async def test_rebuild_courses(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    token_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    payload = {
+        "review_post_title": "This is a course review post",
+        "review_post_text": "This is a course review post",
+        "course_code": "GH-100",
+        "course_name": "the rebuilt course",
+        "likes_amount": 2,
+    }
+    for _ in range(2):
+        response = await client.post("/review_posts", json=payload, headers=headers)
+        assert response.status_code == 200
+
+    # as on a database that predates the courses table
+    await session.exec(delete(models.DBCourse))
+    await session.commit()
+
+    assert await courses.rebuild(session) > 0
+
+    course = await session.get(models.DBCourse, "GH-100")
+    await session.refresh(course)
+    assert course.course_name == "the rebuilt course"
+    assert course.review_posts_amount == 2
+    assert course.likes_amount == 4
+    assert course.latest_review_date is not None
+
+
+@pytest.mark.asyncio
+async def test_course_upsert_without_on_conflict(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    token_user1: models.Token,
+    monkeypatch,
+):
+    # as on a database whose dialect has no INSERT ... ON CONFLICT
+    monkeypatch.setattr(courses, "_inserts", {})
+
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    payload = {
+        "review_post_title": "This is a course review post",
+        "review_post_text": "This is a course review post",
+        "course_code": "IJ-100",
+        "course_name": "the generic course",
+    }
+    for _ in range(2):
+        response = await client.post("/review_posts", json=payload, headers=headers)
+        assert response.status_code == 200
+
+    course = await session.get(models.DBCourse, "IJ-100")
+    await session.refresh(course)
+    assert course.review_posts_amount == 2
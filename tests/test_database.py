@@ -0,0 +1,26 @@
+from psu_course_review import config, models
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_get_session_reuses_the_session_factory(app, monkeypatch):
+    def no_new_factory(*args, **kwargs):
+        raise AssertionError("get_session built a new sessionmaker")
+
+    monkeypatch.setattr(models, "sessionmaker", no_new_factory)
+
+    binds = []
+    for _ in range(2):
+        async for session in models.get_session():
+            binds.append(session.bind)
+
+    assert binds == [models.engine, models.engine]
+
+
+def test_init_db_configures_the_pool(app):
+    settings = config.get_settings()
+    pool = models.engine.pool
+
+    assert pool._recycle == settings.SQLDB_POOL_RECYCLE
+    assert pool._pre_ping == settings.SQLDB_POOL_PRE_PING
+    assert models.engine.echo == settings.SQLDB_ECHO
@@ -118,6 +118,24 @@ async def test_delete_event(
     assert response.json() == {"message": "Event deleted"}
 
 
+@pytest.mark.asyncio
+async def test_delete_event_liked_meanwhile(
+    client: AsyncClient,
+    event_user1: models.DBEvent,
+    token_user1: models.Token,
+    like_after_get,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+
+    like_after_get(models.DBEvent, event_user1.id)
+    response = await client.delete(f"/events/{event_user1.id}", headers=headers)
+
+    assert response.status_code == 200
+
+    response = await client.get(f"/events/{event_user1.id}")
+    assert response.status_code == 404
+
+
 @pytest.mark.asyncio
 async def test_list_events(
     client: AsyncClient,
@@ -143,3 +161,115 @@ async def test_list_events(
     assert check_event["likes_amount"] == event_user1.likes_amount
     assert check_event["author_name"] == event_user1.author_name
     assert check_event["user_id"] == event_user1.user_id
+
+
+@pytest.mark.asyncio
+async def test_list_events_total(
+    client: AsyncClient,
+    token_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+
+    response = await client.get("/events", params={"limit": 1})
+    page_count = response.json()["page_count"]
+
+    payload = {
+        "event_title": "This is a counted event",
+        "event_description": "This is a counted event",
+        "event_date": "30 Oct 2024",
+        "category": "Sport",
+    }
+    response = await client.post("/events", json=payload, headers=headers)
+    assert response.status_code == 200
+
+    response = await client.get("/events", params={"limit": 1})
+    assert response.status_code == 200
+    assert response.json()["page_count"] == page_count + 1
+
+    response = await client.get(
+        "/events", params={"limit": 1, "include_total": "false"}
+    )
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["page_count"] is None
+    assert len(data["events"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_read_event_not_modified(
+    client: AsyncClient,
+    event_user1: models.DBEvent,
+):
+    response = await client.get(f"/events/{event_user1.id}")
+    etag = response.headers["etag"]
+
+    assert response.status_code == 200
+
+    response = await client.get(
+        f"/events/{event_user1.id}", headers={"If-None-Match": etag}
+    )
+
+    assert response.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_read_events_batch(
+    client: AsyncClient,
+    event_user1: models.DBEvent,
+    token_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    payload = {
+        "event_title": "This is a batched event",
+        "event_description": "This is a batched event",
+        "event_date": "30 Oct 2024",
+        "category": "Sport",
+    }
+    response = await client.post("/events", json=payload, headers=headers)
+    event_id = response.json()["id"]
+
+    response = await client.get(
+        "/events/batch",
+        params={"ids": f"{event_id},999999,{event_user1.id},{event_id}"},
+    )
+    data = response.json()
+
+    assert response.status_code == 200
+    assert [event["id"] for event in data] == [event_id, event_user1.id]
+    assert data[0]["event_title"] == payload["event_title"]
+
+    response = await client.get("/events/batch", params={"ids": "1,two"})
+    assert response.status_code == 400
+
+    ids = ",".join(str(i) for i in range(1, 102))
+    response = await client.get("/events/batch", params={"ids": ids})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_create_events_bulk(
+    client: AsyncClient,
+    token_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    payload = [
+        {
+            "event_title": f"Semester event {i}",
+            "event_description": "This is an imported event",
+            "event_date": "1 Jan 2025",
+            "category": "Education",
+        }
+        for i in range(2)
+    ]
+
+    response = await client.post("/events/bulk", json=payload, headers=headers)
+    data = response.json()
+
+    assert response.status_code == 200
+    assert len(data["created_ids"]) == 2
+    assert data["errors"] == []
+
+    response = await client.get(f"/events/{data['created_ids'][1]}")
+    assert response.json()["event_title"] == "Semester event 1"
+    assert response.json()["user_id"] == token_user1.user_id
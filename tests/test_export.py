@@ -0,0 +1,70 @@
+import csv
+import datetime
+import json
+
+from httpx import AsyncClient
+from psu_course_review import models
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_export_review_posts(
+    client: AsyncClient,
+    review_post_user1: models.DBReviewPost,
+    token_user1: models.Token,
+):
+    response = await client.get("/export/review_posts")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    ids = [row["id"] for row in rows]
+    assert review_post_user1.id in ids
+    assert ids == sorted(ids)
+
+    response = await client.get("/export/review_posts", params={"format": "csv"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    csv_rows = list(csv.DictReader(response.text.splitlines()))
+    assert [int(row["id"]) for row in csv_rows] == ids
+
+    since = datetime.datetime.now()
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    payload = {
+        "review_post_title": "An exported review post",
+        "review_post_text": "This is a review post",
+        "course_code": "111-222",
+        "course_name": "the course",
+    }
+    response = await client.post("/review_posts", json=payload, headers=headers)
+    review_post_id = response.json()["id"]
+
+    response = await client.get(
+        "/export/review_posts", params={"since": since.isoformat()}
+    )
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == [review_post_id]
+
+    # the same instant with an offset, as clients in other timezones send it
+    bangkok = datetime.timezone(datetime.timedelta(hours=7))
+    response = await client.get(
+        "/export/review_posts",
+        params={"since": since.astimezone(bangkok).isoformat()},
+    )
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == [review_post_id]
+
+
+@pytest.mark.asyncio
+async def test_export_comments(
+    client: AsyncClient,
+    comment_user1: models.DBComment,
+):
+    response = await client.get("/export/comments", params={"format": "csv"})
+
+    assert response.status_code == 200
+    rows = list(csv.DictReader(response.text.splitlines()))
+    assert str(comment_user1.id) in [row["id"] for row in rows]
+    assert "comment_text" in rows[0]
@@ -0,0 +1,56 @@
+from psu_course_review import logs
+import json
+import logging
+import queue
+
+
+def test_json_formatter_keeps_extra_fields():
+    record = logging.makeLogRecord(
+        dict(
+            name="psu_course_review.deps",
+            levelno=logging.INFO,
+            levelname="INFO",
+            msg="Rejected access token",
+            event="auth.rejected",
+            error="Signature has expired",
+        )
+    )
+
+    entry = json.loads(logs.JSONFormatter().format(record))
+
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "psu_course_review.deps"
+    assert entry["message"] == "Rejected access token"
+    assert entry["event"] == "auth.rejected"
+    assert entry["error"] == "Signature has expired"
+
+
+def test_traceback_kept_through_the_queue():
+    log_queue = queue.SimpleQueue()
+    logger = logging.getLogger("psu_course_review.tests.queue")
+    logger.addHandler(logs.QueueHandler(log_queue))
+    logger.propagate = False
+
+    try:
+        raise RuntimeError("flush failed")
+    except RuntimeError:
+        logger.exception("Failed to flush likes")
+
+    entry = json.loads(logs.JSONFormatter().format(log_queue.get_nowait()))
+
+    assert entry["message"] == "Failed to flush likes"
+    assert "Traceback" in entry["exc_info"]
+    assert "RuntimeError: flush failed" in entry["exc_info"]
+
+
+def test_sampling_filter():
+    sampling = logs.SamplingFilter({"auth.authenticated": 0.0})
+
+    def record(level: int, **extra) -> logging.LogRecord:
+        return logging.makeLogRecord(dict(levelno=level, **extra))
+
+    assert not sampling.filter(record(logging.DEBUG, event="auth.authenticated"))
+    # warnings and unsampled events are always kept
+    assert sampling.filter(record(logging.WARNING, event="auth.authenticated"))
+    assert sampling.filter(record(logging.INFO, event="auth.rejected"))
+    assert sampling.filter(record(logging.INFO))
@@ -1,5 +1,8 @@
+import asyncio
+import importlib.util
+
 from httpx import AsyncClient
-from psu_course_review import models
+from psu_course_review import counters, http_cache, models, likes, pagination
 import pytest
 
 
@@ -120,6 +123,26 @@ async def test_delete_review_post(
     assert response.json() == {"message": "Review Post deleted"}
 
 
+@pytest.mark.asyncio
+async def test_delete_review_post_liked_meanwhile(
+    client: AsyncClient,
+    review_post_user1: models.DBReviewPost,
+    token_user1: models.Token,
+    like_after_get,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+
+    like_after_get(models.DBReviewPost, review_post_user1.id)
+    response = await client.delete(
+        f"/review_posts/{review_post_user1.id}", headers=headers
+    )
+
+    assert response.status_code == 200
+
+    response = await client.get(f"/review_posts/{review_post_user1.id}")
+    assert response.status_code == 404
+
+
 @pytest.mark.asyncio
 async def test_list_review_posts(
     client: AsyncClient,
@@ -191,3 +214,593 @@ async def test_comments_amount_field_of_review_posts_increase_and_decrease(
     assert response.status_code == 200
     assert review_post_data["comments_amount"] == 0
     # ---------------------------------------------------------------------------------------------------------
+
+
+@pytest.mark.asyncio
+async def test_list_review_posts_with_cursor(
+    client: AsyncClient,
+    review_post_user1: models.DBReviewPost,
+    token_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    payload = {
+        "review_post_title": "This is a cursor review post",
+        "review_post_text": "This is a cursor review post",
+        "course_code": "111-222",
+        "course_name": "the course",
+    }
+    for _ in range(3):
+        response = await client.post("/review_posts", json=payload, headers=headers)
+        assert response.status_code == 200
+
+    ids = []
+    params = {"limit": 2}
+    while True:
+        response = await client.get("/review_posts", params=params)
+        data = response.json()
+
+        assert response.status_code == 200
+        if "after" in params:
+            assert data["page"] is None
+        assert len(data["review_posts"]) <= 2
+        ids.extend(review_post["id"] for review_post in data["review_posts"])
+
+        if data["next_cursor"] is None:
+            break
+        params = {"limit": 2, "after": data["next_cursor"]}
+
+    assert len(ids) >= 4
+    assert ids == sorted(set(ids))
+    assert review_post_user1.id in ids
+
+    response = await client.get("/review_posts", params={"after": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_row_counts_bounded(
+    session: models.AsyncSession,
+    review_post_user1: models.DBReviewPost,
+    statements: list[str],
+):
+    row_counts = counters.RowCountCache(max_size=2)
+    course_code = review_post_user1.course_code
+    count = await row_counts.get(session, models.DBReviewPost, course_code=course_code)
+
+    # client supplied codes push the oldest counts out instead of piling up
+    for unknown in ["ZZ-001", "ZZ-002"]:
+        await row_counts.get(session, models.DBReviewPost, course_code=unknown)
+
+    statements.clear()
+    await row_counts.get(session, models.DBReviewPost, course_code=course_code)
+    assert len(statements) == 1
+
+    # a write adjusts the counts its row is part of in place
+    await row_counts.adjust(models.DBReviewPost, review_post_user1, 1)
+    statements.clear()
+    assert (
+        await row_counts.get(session, models.DBReviewPost, course_code=course_code)
+        == count + 1
+    )
+    assert statements == []
+
+
+@pytest.mark.asyncio
+async def test_list_my_review_posts_total(
+    client: AsyncClient,
+    token_user2: models.Token,
+):
+    headers = {"Authorization": f"{token_user2.token_type} {token_user2.access_token}"}
+
+    response = await client.get(
+        "/review_posts/my", params={"limit": 1}, headers=headers
+    )
+    page_count = response.json()["page_count"]
+
+    payload = {
+        "review_post_title": "This is a review post of user2",
+        "review_post_text": "This is a review post of user2",
+        "course_code": "111-222",
+        "course_name": "the course",
+    }
+    response = await client.post("/review_posts", json=payload, headers=headers)
+    review_post_id = response.json()["id"]
+    assert response.status_code == 200
+
+    response = await client.get(
+        "/review_posts/my", params={"limit": 1}, headers=headers
+    )
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["page_count"] == page_count + 1
+    assert all(
+        review_post["user_id"] == token_user2.user_id
+        for review_post in data["review_posts"]
+    )
+
+    response = await client.delete(f"/review_posts/{review_post_id}", headers=headers)
+    assert response.status_code == 200
+
+    response = await client.get(
+        "/review_posts/my", params={"limit": 1}, headers=headers
+    )
+    assert response.json()["page_count"] == page_count
+
+
+@pytest.mark.asyncio
+async def test_like_and_unlike_review_post(
+    client: AsyncClient,
+    token_user1: models.Token,
+    token_user2: models.Token,
+):
+    headers1 = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    headers2 = {"Authorization": f"{token_user2.token_type} {token_user2.access_token}"}
+    payload = {
+        "review_post_title": "This is a liked review post",
+        "review_post_text": "This is a liked review post",
+        "course_code": "111-222",
+        "course_name": "the course",
+    }
+    response = await client.post("/review_posts", json=payload, headers=headers1)
+    review_post_id = response.json()["id"]
+
+    for headers in [headers1, headers1, headers2]:
+        response = await client.post(
+            f"/review_posts/{review_post_id}/like", headers=headers
+        )
+        assert response.status_code == 200
+        assert response.json()["liked"] is True
+
+    assert response.json()["likes_amount"] == 2
+
+    await likes.like_buffer.flush()
+
+    response = await client.get(f"/review_posts/{review_post_id}")
+    assert response.json()["likes_amount"] == 2
+
+    for _ in range(2):
+        response = await client.delete(
+            f"/review_posts/{review_post_id}/like", headers=headers2
+        )
+        data = response.json()
+
+        assert response.status_code == 200
+        assert data == {"liked": False, "likes_amount": 1}
+
+    await likes.like_buffer.flush()
+
+    response = await client.get(f"/review_posts/{review_post_id}")
+    assert response.json()["likes_amount"] == 1
+
+    response = await client.post("/review_posts/999999/like", headers=headers1)
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_search_review_posts(
+    client: AsyncClient,
+    token_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    created_ids = []
+    for text in ["quantum mechanics is hard", "quantum quantum chemistry", "poetry"]:
+        payload = {
+            "review_post_title": "This is a searchable review post",
+            "review_post_text": text,
+            "course_code": "333-444",
+            "course_name": "Searchable course",
+        }
+        response = await client.post("/review_posts", json=payload, headers=headers)
+        assert response.status_code == 200
+        created_ids.append(response.json()["id"])
+
+    response = await client.get("/review_posts/search", params={"q": "quantum"})
+    data = response.json()
+
+    assert response.status_code == 200
+    ids = [review_post["id"] for review_post in data["review_posts"]]
+    assert sorted(ids) == sorted(created_ids[:2])
+    assert ids[0] == created_ids[1]
+
+    response = await client.get(
+        "/review_posts/search", params={"q": "quantum", "limit": 1}
+    )
+    first_page = response.json()
+    assert first_page["next_cursor"] is not None
+
+    response = await client.get(
+        "/review_posts/search",
+        params={"q": "quantum", "limit": 1, "after": first_page["next_cursor"]},
+    )
+    second_page = response.json()
+    assert [review_post["id"] for review_post in second_page["review_posts"]] == ids[1:]
+    assert second_page["next_cursor"] is None
+
+    response = await client.get("/review_posts/search", params={"q": "333-444"})
+    assert set(created_ids) <= {
+        review_post["id"] for review_post in response.json()["review_posts"]
+    }
+
+    response = await client.get("/review_posts/search", params={"q": 'AND "( OR'})
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_read_review_post_not_modified(
+    client: AsyncClient,
+    review_post_user1: models.DBReviewPost,
+    token_user1: models.Token,
+):
+    response = await client.get(f"/review_posts/{review_post_user1.id}")
+    etag = response.headers["etag"]
+
+    assert response.status_code == 200
+    assert "cache-control" in response.headers
+
+    response = await client.get(
+        f"/review_posts/{review_post_user1.id}", headers={"If-None-Match": etag}
+    )
+
+    assert response.status_code == 304
+    assert response.content == b""
+
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    payload = {
+        "review_post_title": "An updated title",
+        "review_post_text": "This is a test review post",
+        "course_code": "111-222",
+        "course_name": "the course",
+    }
+    await client.put(
+        f"/review_posts/{review_post_user1.id}", json=payload, headers=headers
+    )
+
+    response = await client.get(
+        f"/review_posts/{review_post_user1.id}", headers={"If-None-Match": etag}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_list_review_posts_cache_invalidated_on_write(
+    client: AsyncClient,
+    token_user1: models.Token,
+):
+    response = await client.get("/review_posts", params={"limit": 1})
+    etag = response.headers["etag"]
+
+    assert response.status_code == 200
+
+    response = await client.get(
+        "/review_posts", params={"limit": 1}, headers={"If-None-Match": etag}
+    )
+
+    assert response.status_code == 304
+
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    payload = {
+        "review_post_title": "A fresh review post",
+        "review_post_text": "This is a review post",
+        "course_code": "CACHE-1",
+        "course_name": "the course",
+    }
+    await client.post("/review_posts", json=payload, headers=headers)
+
+    response = await client.get(
+        "/review_posts", params={"limit": 1}, headers={"If-None-Match": etag}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_list_cache_invalidated_by_another_worker(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    user1: models.DBUser,
+):
+    # a second copy of the module stands in for another worker on the same backend
+    spec = importlib.util.find_spec("psu_course_review.http_cache")
+    other_worker = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(other_worker)
+    other_worker.response_cache = http_cache.response_cache
+
+    params = {"course_code": "CACHE-2"}
+    response = await client.get("/review_posts", params=params)
+    etag = response.headers["etag"]
+    assert response.json()["review_posts"] == []
+
+    session.add(
+        models.DBReviewPost(
+            review_post_title="Written by another worker",
+            review_post_text="This is a review post",
+            course_code="CACHE-2",
+            course_name="the course",
+            user=user1,
+        )
+    )
+    await session.commit()
+    await other_worker.invalidate("review_posts")
+
+    response = await client.get(
+        "/review_posts", params=params, headers={"If-None-Match": etag}
+    )
+
+    assert response.status_code == 200
+    assert len(response.json()["review_posts"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_list_cache_skips_page_read_before_a_write(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    user1: models.DBUser,
+    monkeypatch,
+):
+    paginate = pagination.paginate
+
+    async def paginate_then_write(*args, **kwargs):
+        # a write commits after the page was read but before it is cached
+        page = await paginate(*args, **kwargs)
+        monkeypatch.setattr(pagination, "paginate", paginate)
+        session.add(
+            models.DBReviewPost(
+                review_post_title="Written while the page was read",
+                review_post_text="This is a review post",
+                course_code="CACHE-3",
+                course_name="the course",
+                user=user1,
+            )
+        )
+        await session.commit()
+        await http_cache.invalidate("review_posts")
+        return page
+
+    monkeypatch.setattr(pagination, "paginate", paginate_then_write)
+
+    params = {"course_code": "CACHE-3"}
+    response = await client.get("/review_posts", params=params)
+    assert response.json()["review_posts"] == []
+
+    response = await client.get("/review_posts", params=params)
+    assert len(response.json()["review_posts"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_update_review_post_if_match(
+    client: AsyncClient,
+    token_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    payload = {
+        "review_post_title": "A versioned review post",
+        "review_post_text": "This is a review post",
+        "course_code": "111-222",
+        "course_name": "the course",
+    }
+    response = await client.post("/review_posts", json=payload, headers=headers)
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["version"] == 1
+    assert data["created_at"] is not None
+    assert data["updated_at"] is not None
+
+    response = await client.get(f"/review_posts/{data['id']}")
+    etag = response.headers["etag"]
+
+    payload["review_post_title"] = "A versioned review post, edited"
+    response = await client.put(
+        f"/review_posts/{data['id']}",
+        json=payload,
+        headers=headers | {"If-Match": etag},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+    assert response.headers["etag"] != etag
+
+    payload["review_post_title"] = "A lost update"
+    response = await client.put(
+        f"/review_posts/{data['id']}",
+        json=payload,
+        headers=headers | {"If-Match": etag},
+    )
+
+    assert response.status_code == 412
+
+    response = await client.get(f"/review_posts/{data['id']}")
+    assert response.json()["review_post_title"] == "A versioned review post, edited"
+
+
+@pytest.mark.asyncio
+async def test_read_review_post_include_comments(
+    client: AsyncClient,
+    token_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    payload = {
+        "review_post_title": "A discussed review post",
+        "review_post_text": "This is a review post",
+        "course_code": "111-222",
+        "course_name": "the course",
+    }
+    response = await client.post("/review_posts", json=payload, headers=headers)
+    review_post_id = response.json()["id"]
+
+    response = await client.get(
+        f"/review_posts/{review_post_id}", params={"include": "comments"}
+    )
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["id"] == review_post_id
+    assert data["comments"] == []
+    assert data["comments_next_cursor"] is None
+
+    comment_ids = []
+    for i in range(3):
+        comment_payload = {
+            "comment_text": f"Reply {i}",
+            "review_post_id": review_post_id,
+        }
+        response = await client.post("/comments", json=comment_payload, headers=headers)
+        comment_ids.append(response.json()["id"])
+
+    response = await client.get(
+        f"/review_posts/{review_post_id}",
+        params={"include": "comments", "comments_limit": 2},
+    )
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["comments_amount"] == 3
+    assert [comment["id"] for comment in data["comments"]] == comment_ids[:2]
+
+    response = await client.get(
+        f"/comments/review_post/{review_post_id}",
+        params={"after": data["comments_next_cursor"]},
+    )
+    assert [comment["id"] for comment in response.json()["comments"]] == comment_ids[2:]
+
+    response = await client.get(f"/review_posts/{review_post_id}")
+    assert "comments" not in response.json()
+
+    response = await client.get("/review_posts/999999", params={"include": "comments"})
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_create_review_posts_bulk(
+    client: AsyncClient,
+    token_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    payload = [
+        {
+            "review_post_title": f"Imported review post {i}",
+            "review_post_text": "This is an imported review post",
+            "course_code": "BULK-1",
+            "course_name": "the imported course",
+        }
+        for i in range(3)
+    ]
+    payload.insert(1, {"review_post_title": "Missing fields"})
+
+    response = await client.post("/review_posts/bulk", json=payload, headers=headers)
+    data = response.json()
+
+    assert response.status_code == 200
+    assert len(data["created_ids"]) == 3
+    assert [error["index"] for error in data["errors"]] == [1]
+
+    response = await client.get(
+        "/review_posts/batch", params={"ids": ",".join(map(str, data["created_ids"]))}
+    )
+    titles = [review_post["review_post_title"] for review_post in response.json()]
+    assert titles == [f"Imported review post {i}" for i in range(3)]
+
+    response = await client.get("/courses", params={"sort": "course_code"})
+    course = next(c for c in response.json()["courses"] if c["course_code"] == "BULK-1")
+    assert course["review_posts_amount"] == 3
+
+    lines = [
+        '{"review_post_title": "Streamed", "review_post_text": "text", '
+        '"course_code": "BULK-1", "course_name": "the imported course"}',
+        "not json",
+    ]
+    response = await client.post(
+        "/review_posts/bulk",
+        content="\n".join(lines) + "\n",
+        headers=headers | {"Content-Type": "application/x-ndjson"},
+    )
+    data = response.json()
+
+    assert response.status_code == 200
+    assert len(data["created_ids"]) == 1
+    assert [error["index"] for error in data["errors"]] == [1]
+
+    response = await client.post(
+        "/review_posts/bulk", json={"not": "a list"}, headers=headers
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_delete_review_post_cascades_comments(
+    client: AsyncClient,
+    token_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    payload = {
+        "review_post_title": "A doomed review post",
+        "review_post_text": "This is a review post",
+        "course_code": "111-222",
+        "course_name": "the course",
+    }
+    response = await client.post("/review_posts", json=payload, headers=headers)
+    review_post_id = response.json()["id"]
+
+    comment_payload = {"comment_text": "Doomed", "review_post_id": review_post_id}
+    response = await client.post("/comments", json=comment_payload, headers=headers)
+    comment_id = response.json()["id"]
+    await client.post(f"/comments/{comment_id}/like", headers=headers)
+
+    response = await client.get("/sync")
+    since = response.json()["next_token"]
+    while response.json()["has_more"]:
+        response = await client.get("/sync", params={"since": since})
+        since = response.json()["next_token"]
+
+    response = await client.delete(f"/review_posts/{review_post_id}", headers=headers)
+    assert response.status_code == 200
+
+    response = await client.get(f"/comments/{comment_id}")
+    assert response.status_code == 404
+
+    response = await client.get(f"/comments/review_post/{review_post_id}")
+    assert response.json()["comments"] == []
+    assert response.json()["page_count"] == 0
+
+    response = await client.get("/sync", params={"since": since})
+    assert {"resource": "comments", "id": comment_id} in response.json()["deleted"]
+
+
+@pytest.mark.asyncio
+async def test_like_buffer_stop_during_flush(
+    session: models.AsyncSession,
+    review_post_user1: models.DBReviewPost,
+    monkeypatch,
+):
+    await session.refresh(review_post_user1)
+    likes_amount = review_post_user1.likes_amount
+
+    flushing = asyncio.Event()
+    release = asyncio.Event()
+    increment_likes = likes.increment_likes
+
+    async def slow_increment_likes(*args, **kwargs):
+        flushing.set()
+        await release.wait()
+        await increment_likes(*args, **kwargs)
+
+    monkeypatch.setattr(likes, "increment_likes", slow_increment_likes)
+
+    like_buffer = likes.LikeBuffer(flush_interval=0.01)
+    like_buffer.start()
+    like_buffer.add(models.DBReviewPost, review_post_user1.id, 3)
+    await flushing.wait()
+
+    # stop while the periodic flush holds the swapped out deltas
+    stopping = asyncio.create_task(like_buffer.stop())
+    await asyncio.sleep(0.05)
+    release.set()
+    await stopping
+
+    await session.refresh(review_post_user1)
+    assert review_post_user1.likes_amount == likes_amount + 3
+    assert like_buffer.pending(models.DBReviewPost, review_post_user1.id) == 0
@@ -0,0 +1,131 @@
+from httpx import AsyncClient
+from psu_course_review import models
+import pytest
+
+
+def summarize(statements: list[str]) -> list[str]:
+    # "INSERT changes", "UPDATE users", ... in the order they were sent
+    summary = []
+    for statement in statements:
+        words = statement.replace("(", " ").split()
+        verb = words[0].upper()
+        if verb == "SELECT":
+            table = words[words.index("FROM") + 1]
+        elif verb == "INSERT":
+            table = words[2]
+        else:
+            table = words[1]
+        summary.append(f"{verb} {table}")
+    return summary
+
+
+@pytest.mark.asyncio
+async def test_write_endpoints_skip_refresh(
+    client: AsyncClient,
+    token_user1: models.Token,
+    statements: list[str],
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    # warm the authenticated user cache so only the handlers are counted
+    await client.get("/users/me", headers=headers)
+
+    statements.clear()
+    payload = {
+        "review_post_title": "A counted review post",
+        "review_post_text": "This is a review post",
+        "course_code": "111-222",
+        "course_name": "the course",
+    }
+    response = await client.post("/review_posts", json=payload, headers=headers)
+    review_post = response.json()
+    assert response.status_code == 200
+    # the post, its change entry, the author's counter and the course upsert
+    assert summarize(statements) == [
+        "INSERT review_posts",
+        "INSERT changes",
+        "UPDATE users",
+        "INSERT courses",
+    ]
+
+    statements.clear()
+    payload["review_post_title"] = "A counted review post, edited"
+    payload["likes_amount"] = 3
+    response = await client.put(
+        f"/review_posts/{review_post['id']}", json=payload, headers=headers
+    )
+    updated = response.json()
+    assert response.status_code == 200
+    # the only read is the ownership check before the UPDATE, the likes
+    # increment records the change for both UPDATEs
+    assert summarize(statements) == [
+        "SELECT review_posts",
+        "UPDATE review_posts",
+        "UPDATE review_posts",
+        "INSERT changes",
+        "UPDATE courses",
+    ]
+
+    response = await client.get(f"/review_posts/{review_post['id']}")
+    assert response.json() == updated
+    assert updated["version"] == review_post["version"] + 2
+
+    statements.clear()
+    comment_payload = {"comment_text": "Counted", "review_post_id": review_post["id"]}
+    response = await client.post("/comments", json=comment_payload, headers=headers)
+    comment = response.json()
+    assert response.status_code == 200
+    assert summarize(statements) == [
+        "UPDATE review_posts",
+        "INSERT changes",
+        "UPDATE courses",
+        "INSERT comments",
+        "INSERT changes",
+    ]
+
+    statements.clear()
+    comment_payload["comment_text"] = "Counted, edited"
+    response = await client.put(
+        f"/comments/{comment['id']}", json=comment_payload, headers=headers
+    )
+    assert response.status_code == 200
+    assert summarize(statements) == [
+        "SELECT comments",
+        "UPDATE comments",
+        "INSERT changes",
+    ]
+
+    response = await client.get(f"/comments/{comment['id']}")
+    assert response.json()["comment_text"] == "Counted, edited"
+
+    statements.clear()
+    event_payload = {
+        "event_title": "A counted event",
+        "event_description": "This is a counted event",
+        "event_date": "30 Oct 2024",
+        "category": "Sport",
+    }
+    response = await client.post("/events", json=event_payload, headers=headers)
+    event = response.json()
+    assert response.status_code == 200
+    assert summarize(statements) == [
+        "INSERT events",
+        "INSERT changes",
+        "UPDATE users",
+    ]
+
+    statements.clear()
+    event_payload["likes_amount"] = 2
+    response = await client.put(
+        f"/events/{event['id']}", json=event_payload, headers=headers
+    )
+    updated = response.json()
+    assert response.status_code == 200
+    # only likes_amount changed, so the increment is the only write
+    assert summarize(statements) == [
+        "SELECT events",
+        "UPDATE events",
+        "INSERT changes",
+    ]
+
+    response = await client.get(f"/events/{event['id']}")
+    assert response.json() == updated
@@ -0,0 +1,145 @@
+from httpx import AsyncClient
+from psu_course_review import changes, maintenance, models, pagination
+from sqlalchemy.dialects import postgresql
+from types import SimpleNamespace
+import pytest
+import time
+
+
+async def latest_token(client: AsyncClient) -> str:
+    params = {}
+    while True:
+        response = await client.get("/sync", params=params)
+        assert response.status_code == 200
+        data = response.json()
+        params = {"since": data["next_token"]}
+        if not data["has_more"]:
+            return data["next_token"]
+
+
+@pytest.mark.asyncio
+async def test_sync_changes_since_token(
+    client: AsyncClient,
+    token_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    since = await latest_token(client)
+
+    response = await client.get("/sync", params={"since": since})
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["review_posts"] == data["comments"] == data["events"] == []
+    assert data["deleted"] == []
+    # the position stays, only the issue time of the token moves
+    position = pagination.decode_cursor(data["next_token"])
+    assert position.pop("at") >= pagination.decode_cursor(since).pop("at")
+    assert position == {
+        key: value
+        for key, value in pagination.decode_cursor(since).items()
+        if key != "at"
+    }
+
+    payload = {
+        "review_post_title": "A synced review post",
+        "review_post_text": "This is a review post",
+        "course_code": "111-222",
+        "course_name": "the course",
+    }
+    response = await client.post("/review_posts", json=payload, headers=headers)
+    kept_id = response.json()["id"]
+    response = await client.post("/review_posts", json=payload, headers=headers)
+    deleted_id = response.json()["id"]
+
+    comment_payload = {"comment_text": "Synced", "review_post_id": kept_id}
+    response = await client.post("/comments", json=comment_payload, headers=headers)
+    comment_id = response.json()["id"]
+
+    response = await client.delete(f"/review_posts/{deleted_id}", headers=headers)
+    assert response.status_code == 200
+
+    response = await client.get("/sync", params={"since": since})
+    data = response.json()
+
+    assert response.status_code == 200
+    assert [review_post["id"] for review_post in data["review_posts"]] == [kept_id]
+    assert data["review_posts"][0]["comments_amount"] == 1
+    assert [comment["id"] for comment in data["comments"]] == [comment_id]
+    assert data["deleted"] == [{"resource": "review_posts", "id": deleted_id}]
+
+    response = await client.get(
+        "/sync", params={"since": data["next_token"], "limit": 1}
+    )
+    assert response.json()["review_posts"] == []
+    assert response.json()["has_more"] is False
+
+    response = await client.get("/sync", params={"since": since, "limit": 1})
+    data = response.json()
+    assert data["has_more"] is True
+    assert data["comments"] == [] and data["deleted"] == []
+
+    response = await client.get("/sync", params={"since": "not-a-token"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_sync_token_expires_with_tombstone_retention(client: AsyncClient):
+    retention = changes.settings.SYNC_TOMBSTONE_RETENTION_DAYS * 24 * 60 * 60
+    expired = pagination.encode_cursor(
+        txid=0, id=0, at=int(time.time() - retention - 60)
+    )
+
+    response = await client.get("/sync", params={"since": expired})
+    assert response.status_code == 410
+
+
+@pytest.mark.asyncio
+async def test_compact_changes(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    token_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    since = await latest_token(client)
+
+    payload = {
+        "review_post_title": "A compacted review post",
+        "review_post_text": "This is a review post",
+        "course_code": "111-222",
+        "course_name": "the course",
+    }
+    response = await client.post("/review_posts", json=payload, headers=headers)
+    review_post_id = response.json()["id"]
+    for title in ["Edited once", "Edited twice"]:
+        response = await client.put(
+            f"/review_posts/{review_post_id}",
+            json=payload | {"review_post_title": title},
+            headers=headers,
+        )
+        assert response.status_code == 200
+
+    superseded, _ = await maintenance.compact_changes(session)
+    assert superseded >= 2
+
+    result = await session.exec(
+        models.select(models.DBChange).where(
+            models.DBChange.resource == "review_posts",
+            models.DBChange.row_id == review_post_id,
+        )
+    )
+    assert len(result.all()) == 1
+
+    response = await client.get("/sync", params={"since": since})
+    [review_post] = response.json()["review_posts"]
+    assert review_post["review_post_title"] == "Edited twice"
+
+
+def test_sync_position_on_postgresql():
+    # entries of transactions still running are held back, not skipped
+    session = SimpleNamespace(bind=SimpleNamespace(dialect=postgresql.dialect()))
+
+    visible = changes._visible(session).compile(dialect=postgresql.dialect())
+    assert "pg_snapshot_xmin(pg_current_snapshot())" in str(visible)
+
+    txid = changes._txid(session).compile(dialect=postgresql.dialect())
+    assert "pg_current_xact_id()" in str(txid)
@@ -0,0 +1,296 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlmodel import func, select, update
+from psu_course_review import maintenance, models
+import pytest
+
+
+# the users table as the first release created it
+OLD_USERS_TABLE = """
+CREATE TABLE users (
+    id INTEGER NOT NULL PRIMARY KEY,
+    email VARCHAR NOT NULL,
+    username VARCHAR NOT NULL,
+    first_name VARCHAR NOT NULL,
+    last_name VARCHAR NOT NULL,
+    password VARCHAR NOT NULL,
+    register_date DATETIME NOT NULL,
+    updated_date DATETIME NOT NULL,
+    last_login_date DATETIME,
+    roles JSON
+)
+"""
+
+
+def test_upgrade_schema_adds_missing_columns():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(text(OLD_USERS_TABLE))
+        connection.execute(
+            text(
+                "INSERT INTO users VALUES (1, 'old@email.local', 'old', 'Old', "
+                "'User', 'x', '2023-01-01 00:00:00', '2023-01-01 00:00:00', "
+                "NULL, '[\"user\"]')"
+            )
+        )
+
+        added = maintenance.upgrade_schema(connection)
+
+        assert "users.review_posts_amount" in added
+        assert "users.events_amount" in added
+        row = connection.execute(
+            text("SELECT review_posts_amount, events_amount FROM users")
+        ).one()
+        assert tuple(row) == (0, 0)
+
+        inspector = inspect(connection)
+        assert inspector.has_table("review_posts")
+        assert "ix_users_username" in {
+            index["name"] for index in inspector.get_indexes("users")
+        }
+
+        assert inspector.has_table("review_posts_fts")
+
+        # a second run has nothing left to do
+        assert maintenance.upgrade_schema(connection) == []
+
+
+def test_upgrade_schema_stops_on_duplicate_users():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(text(OLD_USERS_TABLE))
+        for user_id, username in [(1, "first"), (2, "second")]:
+            connection.execute(
+                text(
+                    "INSERT INTO users VALUES (:id, 'same@email.local', :username, "
+                    "'Old', 'User', 'x', '2023-01-01 00:00:00', "
+                    "'2023-01-01 00:00:00', NULL, '[\"user\"]')"
+                ),
+                dict(id=user_id, username=username),
+            )
+
+        assert maintenance.find_duplicates(connection) == {
+            "users(email)": ["same@email.local"]
+        }
+        with pytest.raises(ValueError, match="same@email.local"):
+            maintenance.upgrade_schema(connection)
+
+        # stopped before the first change
+        inspector = inspect(connection)
+        assert not inspector.has_table("review_posts")
+        assert "review_posts_amount" not in {
+            column["name"] for column in inspector.get_columns("users")
+        }
+
+        connection.execute(
+            text("UPDATE users SET email = 'second@email.local' WHERE id = 2")
+        )
+        assert maintenance.find_duplicates(connection) == {}
+        assert "users.review_posts_amount" in maintenance.upgrade_schema(connection)
+
+
+@pytest.mark.asyncio
+async def test_recount_counters(
+    session: models.AsyncSession,
+    user1: models.DBUser,
+    review_post_user1: models.DBReviewPost,
+):
+    session.add(
+        models.DBComment(
+            comment_text="Counted", review_post_id=review_post_user1.id, user=user1
+        )
+    )
+    user1.review_posts_amount = 1_000
+    review_post_user1.comments_amount = 1_000
+    session.add_all([user1, review_post_user1])
+    await session.commit()
+
+    await maintenance.recount_counters(session)
+
+    await session.refresh(user1)
+    await session.refresh(review_post_user1)
+    review_posts = await session.exec(
+        select(func.count(models.DBReviewPost.id)).where(
+            models.DBReviewPost.user_id == user1.id
+        )
+    )
+    comments = await session.exec(
+        select(func.count(models.DBComment.id)).where(
+            models.DBComment.review_post_id == review_post_user1.id
+        )
+    )
+    assert user1.review_posts_amount == review_posts.one()
+    assert review_post_user1.comments_amount == comments.one()
+
+
+def test_upgrade_schema_indexes_existing_review_posts():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        models.SQLModel.metadata.create_all(connection)
+        # the search table and its triggers did not exist yet
+        connection.execute(text("DROP TABLE review_posts_fts"))
+        for trigger in ["insert", "delete", "update"]:
+            connection.execute(text(f"DROP TRIGGER review_posts_fts_{trigger}"))
+        connection.execute(
+            text(
+                "INSERT INTO review_posts (id, review_post_title, review_post_text, "
+                "course_code, course_name, likes_amount, comments_amount, "
+                "created_at, updated_at, version, user_id) VALUES (1, 'Old', "
+                "'written before search', '240-101', 'the course', 0, 0, "
+                "'2023-01-01 00:00:00', '2023-01-01 00:00:00', 1, 1)"
+            )
+        )
+
+        maintenance.upgrade_schema(connection)
+
+        rows = connection.execute(
+            text(
+                "SELECT rowid FROM review_posts_fts WHERE review_posts_fts MATCH 'search'"
+            )
+        ).all()
+        assert [row.rowid for row in rows] == [1]
+
+
+def test_upgrade_schema_indexes_likes_by_target():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        models.SQLModel.metadata.create_all(connection)
+        connection.execute(text("DROP INDEX ix_likes_target"))
+
+        maintenance.upgrade_schema(connection)
+
+        # deleting a target's likes no longer scans the table
+        plan = connection.execute(
+            text(
+                "EXPLAIN QUERY PLAN DELETE FROM likes "
+                "WHERE target_type = 'comment' AND target_id = 1"
+            )
+        ).all()
+        assert any("ix_likes_target" in row.detail for row in plan)
+
+
+@pytest.mark.asyncio
+async def test_normalize_course_codes(
+    session: models.AsyncSession,
+    user1: models.DBUser,
+):
+    review_post = models.DBReviewPost(
+        review_post_title="An old review post",
+        review_post_text="This is a review post",
+        course_code="XY-101",
+        course_name="the course",
+        user=user1,
+    )
+    session.add(review_post)
+    await session.commit()
+
+    # written behind the validator, the way rows were stored before it
+    await session.exec(
+        update(models.DBReviewPost)
+        .where(models.DBReviewPost.id == review_post.id)
+        .values(course_code=" xy - 101 ")
+    )
+    await session.commit()
+
+    normalized = await maintenance.normalize_course_codes(session)
+
+    assert normalized == 1
+    await session.refresh(review_post)
+    assert review_post.course_code == "XY-101"
+    assert await maintenance.normalize_course_codes(session) == 0
+
+
+def test_upgrade_schema_backfills_row_versions():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        models.SQLModel.metadata.create_all(connection)
+        # the columns review posts had before they were versioned
+        for column in ["created_at", "updated_at", "version"]:
+            connection.execute(text(f"DROP INDEX IF EXISTS ix_review_posts_{column}"))
+            connection.execute(text(f"ALTER TABLE review_posts DROP COLUMN {column}"))
+        connection.execute(
+            text(
+                "INSERT INTO review_posts (id, review_post_title, review_post_text, "
+                "course_code, course_name, likes_amount, comments_amount, user_id) "
+                "VALUES (1, 'Old', 'An old post', '240-101', 'the course', 0, 0, 1)"
+            )
+        )
+
+        added = maintenance.upgrade_schema(connection)
+
+        assert {
+            "review_posts.created_at",
+            "review_posts.updated_at",
+            "review_posts.version",
+        } <= set(added)
+        row = connection.execute(
+            select(
+                models.DBReviewPost.created_at,
+                models.DBReviewPost.updated_at,
+                models.DBReviewPost.version,
+            )
+        ).one()
+        assert row.created_at is not None
+        assert row.updated_at is not None
+        assert row.version == 1
+
+
+def test_cascade_comment_deletes():
+    engine = create_engine("sqlite://")
+    with engine.connect() as connection:
+        connection.execute(text("PRAGMA foreign_keys=ON"))
+        connection.commit()
+        with connection.begin():
+            models.SQLModel.metadata.create_all(connection)
+            # the comments table as it was before ON DELETE CASCADE
+            connection.execute(text("DROP TABLE comments"))
+            connection.execute(
+                text(
+                    "CREATE TABLE comments (comment_text VARCHAR NOT NULL, "
+                    "comment_author VARCHAR, likes_amount INTEGER NOT NULL, "
+                    "id INTEGER NOT NULL PRIMARY KEY, created_at DATETIME NOT NULL, "
+                    "updated_at DATETIME NOT NULL, version INTEGER NOT NULL, "
+                    "review_post_id INTEGER NOT NULL REFERENCES review_posts (id), "
+                    "user_id INTEGER NOT NULL REFERENCES users (id))"
+                )
+            )
+            connection.execute(
+                text(
+                    "INSERT INTO users (id, email, username, first_name, last_name, "
+                    "password, register_date, updated_date, review_posts_amount, "
+                    "events_amount) VALUES (1, 'a@email.local', 'a', 'A', 'A', 'x', "
+                    "'2023-01-01 00:00:00', '2023-01-01 00:00:00', 1, 0)"
+                )
+            )
+            connection.execute(
+                text(
+                    "INSERT INTO review_posts (id, review_post_title, "
+                    "review_post_text, course_code, course_name, likes_amount, "
+                    "comments_amount, created_at, updated_at, version, user_id) "
+                    "VALUES (1, 'Old', 'An old post', '240-101', 'the course', 0, 1, "
+                    "'2023-01-01 00:00:00', '2023-01-01 00:00:00', 1, 1)"
+                )
+            )
+            connection.execute(
+                text(
+                    "INSERT INTO comments VALUES ('Kept', NULL, 0, 1, "
+                    "'2023-01-01 00:00:00', '2023-01-01 00:00:00', 1, 1, 1)"
+                )
+            )
+
+        with connection.begin():
+            assert maintenance.cascade_comment_deletes(connection) is True
+            assert maintenance.cascade_comment_deletes(connection) is False
+
+            [foreign_key] = [
+                foreign_key
+                for foreign_key in inspect(connection).get_foreign_keys("comments")
+                if foreign_key["referred_table"] == "review_posts"
+            ]
+            assert foreign_key["options"]["ondelete"] == "CASCADE"
+            assert "ix_comments_review_post_id_id" in {
+                index["name"] for index in inspect(connection).get_indexes("comments")
+            }
+            assert connection.execute(text("SELECT id FROM comments")).all() == [(1,)]
+
+            connection.execute(text("DELETE FROM review_posts WHERE id = 1"))
+            assert connection.execute(text("SELECT id FROM comments")).all() == []
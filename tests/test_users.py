@@ -0,0 +1,104 @@
+from httpx import AsyncClient
+from psu_course_review import models
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_get_me(
+    client: AsyncClient,
+    user1: models.DBUser,
+    token_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+
+    for _ in range(2):
+        response = await client.get("/users/me", headers=headers)
+        data = response.json()
+
+        assert response.status_code == 200
+        assert data["id"] == user1.id
+        assert data["username"] == user1.username
+        assert "password" not in data
+        assert "roles" not in data
+
+
+@pytest.mark.asyncio
+async def test_update_user_refreshes_current_user(
+    client: AsyncClient,
+    user2: models.DBUser,
+    token_user2: models.Token,
+):
+    headers = {"Authorization": f"{token_user2.token_type} {token_user2.access_token}"}
+
+    response = await client.get("/users/me", headers=headers)
+    me = response.json()
+    assert response.status_code == 200
+
+    payload = {
+        "email": me["email"],
+        "username": me["username"],
+        "first_name": "Changed",
+        "last_name": me["last_name"],
+    }
+    response = await client.put(
+        f"/users/update/{user2.id}/123456", json=payload, headers=headers
+    )
+    assert response.status_code == 200
+
+    response = await client.get("/users/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["first_name"] == "Changed"
+
+    payload["first_name"] = me["first_name"]
+    response = await client.put(
+        f"/users/update/{user2.id}/123456", json=payload, headers=headers
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_get_users_batch(
+    client: AsyncClient,
+    user1: models.DBUser,
+    user2: models.DBUser,
+    token_user1: models.Token,
+):
+    response = await client.get("/users/batch", params={"ids": f"{user2.id}"})
+    assert response.status_code == 401
+
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    response = await client.get(
+        "/users/batch", params={"ids": f"{user2.id},{user1.id}"}, headers=headers
+    )
+    data = response.json()
+
+    assert response.status_code == 200
+    assert [user["username"] for user in data] == [user2.username, user1.username]
+    assert all("password" not in user for user in data)
+
+
+@pytest.mark.asyncio
+async def test_create_user_conflict(client: AsyncClient):
+    payload = {
+        "email": "created@test.com",
+        "username": "created",
+        "first_name": "Firstname",
+        "last_name": "Lastname",
+        "password": "123456",
+    }
+    response = await client.post("/users/create", json=payload)
+    assert response.status_code == 200
+    assert response.json()["username"] == "created"
+
+    response = await client.post("/users/create", json=payload)
+    assert response.status_code == 409
+
+    response = await client.post(
+        "/users/create", json=payload | {"username": "created-again"}
+    )
+    assert response.status_code == 409
+
+    response = await client.post(
+        "/token", data={"username": "created@test.com", "password": "123456"}
+    )
+    assert response.status_code == 200